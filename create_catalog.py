@@ -175,8 +175,13 @@ catalog_data = [
     }
 ]
 
-# Create DataFrame and save to Excel
-df = pd.DataFrame(catalog_data)
-os.makedirs('data', exist_ok=True)
-df.to_excel('data/Apparels_shared.xlsx', index=False)
-print("Sample catalog created successfully!") 
\ No newline at end of file
+def main(output_file: str = 'data/Apparels_shared.xlsx'):
+    """Create DataFrame and save to Excel."""
+    df = pd.DataFrame(catalog_data)
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    df.to_excel(output_file, index=False)
+    print("Sample catalog created successfully!")
+    return df
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,112 @@ Product Catalog Filtering Module
 """
 
 import pandas as pd
+import numpy as np
+import functools
+import logging
 import os
-from typing import Dict, List, Optional, Any
+import threading
+from typing import Dict, List, Optional, Any, Tuple
+
+# Copy-on-Write keeps the shallow catalog copies and row selections below from sharing
+# writes; it is always on from pandas 3.0, where setting the option is deprecated
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+logger = logging.getLogger(__name__)
+
+# Parsed catalog files keyed by (absolute path, modification time), shared across instances
+_CATALOG_CACHE: Dict[Tuple[str, float], pd.DataFrame] = {}
+
+def _read_parquet_sidecar(path: str) -> Optional[pd.DataFrame]:
+    """Read the Parquet copy of a catalog file if it is at least as new as the source."""
+    sidecar = path + '.parquet'
+    if not os.path.exists(sidecar) or os.path.getmtime(sidecar) < os.path.getmtime(path):
+        return None
+    try:
+        return pd.read_parquet(sidecar)
+    except Exception:
+        # pyarrow missing or sidecar unreadable; fall back to parsing the source
+        return None
+
+def _write_parquet_sidecar(path: str, df: pd.DataFrame):
+    """Persist a parsed catalog next to its source so later processes skip parsing."""
+    sidecar = path + '.parquet'
+    # Write then rename so a crash or concurrent reader never sees a truncated sidecar
+    tmp_path = f"{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, sidecar)
+    except ImportError:
+        # Parquet support is optional (requires pyarrow)
+        pass
+    except Exception as e:
+        logger.warning("could not write catalog sidecar: %s", e)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _read_catalog_file(path: str) -> Optional[pd.DataFrame]:
+    """Parse a catalog file, reusing a previous parse if the file is unchanged."""
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    cached = _CATALOG_CACHE.get(key)
+    if cached is not None:
+        return cached.copy(deep=False)
+    
+    df = _read_parquet_sidecar(path)
+    if df is None:
+        if path.endswith('.xlsx'):
+            try:
+                # Calamine is a much faster xlsx parser than the default openpyxl engine
+                df = pd.read_excel(path, engine='calamine')
+            except (ImportError, ValueError):
+                # python-calamine isn't installed, or pandas < 2.2 doesn't know the engine
+                df = pd.read_excel(path)
+        elif path.endswith('.csv'):
+            df = pd.read_csv(path)
+        else:
+            return None
+        _write_parquet_sidecar(path, df)
+    
+    _CATALOG_CACHE[key] = df
+    return df.copy(deep=False)
 
 class CatalogFilter:
+    # String columns that filter_products matches against
+    FILTER_COLUMNS = ['category', 'available_sizes', 'fit', 'fabric', 'color',
+                      'sleeve_length', 'neckline', 'length', 'pant_type', 'occasion']
+    # Low-cardinality string columns stored as pandas categoricals
+    CATEGORICAL_COLUMNS = ['category', 'fit', 'fabric', 'color', 'sleeve_length',
+                           'neckline', 'length', 'pant_type', 'occasion']
+    # Catalog columns copied into each filter_products result, in output order
+    RESULT_COLUMNS = ['product_id', 'name', 'category', 'price', 'available_sizes', 'fit', 'fabric',
+                      'sleeve_length', 'color', 'occasion', 'neckline', 'length', 'pant_type']
+    # Attribute filters as (attribute, column, kind); exact matches are listed before substring ones
+    ATTRIBUTE_FILTERS = [
+        ('fit', 'fit', 'equals'),
+        ('length', 'length', 'equals'),
+        ('fabric', 'fabric', 'contains'),
+        ('color_or_print', 'color', 'contains'),
+        ('sleeve_length', 'sleeve_length', 'contains'),
+        ('neckline', 'neckline', 'contains'),
+        ('pant_type', 'pant_type', 'contains'),
+        ('occasion', 'occasion', 'contains'),
+    ]
+    # Attributes filtered regardless of the requested category
+    GENERIC_FILTER_ATTRIBUTES = ['fabric', 'color_or_print']
+
     def __init__(self, catalog_file: str = "data/Apparels_shared.xlsx"):
         self.catalog_file = catalog_file
         self.catalog_df = None
+        self._lower = {}
+        self._codes = {}
+        self._category_values = {}
+        self._value_masks = {}
+        self._size_index = {}
+        self._contains_index = {}
+        self._filter_plans = {}
+        self._generic_filter_plan = []
+        self._price = None
         
         # Define category-specific valid attributes
         self.category_attributes = {
@@ -19,20 +118,22 @@ class CatalogFilter:
             'pants': ['fit', 'fabric', 'color_or_print', 'pant_type']
         }
         
+        # Per-instance memo of filter results, cleared whenever the catalog is (re)loaded
+        self._filter_cached = functools.lru_cache(maxsize=256)(self._filter_by_key)
+        
         self.load_catalog()
     
     def load_catalog(self):
         """Load the product catalog from file."""
+        self._filter_cached.cache_clear()
+        
         if not os.path.exists(self.catalog_file):
             print(f"Warning: Catalog file {self.catalog_file} not found")
             self.catalog_df = pd.DataFrame()
             return
         
         try:
-            if self.catalog_file.endswith('.xlsx'):
-                self.catalog_df = pd.read_excel(self.catalog_file)
-            elif self.catalog_file.endswith('.csv'):
-                self.catalog_df = pd.read_csv(self.catalog_file)
+            self.catalog_df = _read_catalog_file(self.catalog_file)
             
             print(f"Loaded catalog with {len(self.catalog_df)} products")
             self._standardize_columns()
@@ -54,6 +155,9 @@ class CatalogFilter:
         
         self.catalog_df = self.catalog_df.rename(columns=column_mapping)
         
+        # Only result columns are ever read back, so drop the rest (brand, season, ...)
+        self.catalog_df = self.catalog_df[[c for c in self.catalog_df.columns if c in self.RESULT_COLUMNS]]
+        
         # Clean up category column (remove leading space from ' pants')
         if 'category' in self.catalog_df.columns:
             self.catalog_df['category'] = self.catalog_df['category'].str.strip()
@@ -62,127 +166,188 @@ class CatalogFilter:
         if 'price' in self.catalog_df.columns:
             self.catalog_df['price'] = pd.to_numeric(self.catalog_df['price'], errors='coerce')
         
+        # Store repetitive string columns as categoricals (int codes + one copy of each value)
+        for col in self.CATEGORICAL_COLUMNS:
+            if col in self.catalog_df.columns:
+                self.catalog_df[col] = self.catalog_df[col].astype('category')
+        
+        # Keep rows ordered by price: budget becomes a prefix and results need no per-query sort
+        if 'price' in self.catalog_df.columns:
+            self.catalog_df = self.catalog_df.sort_values('price', kind='stable').reset_index(drop=True)
+        
         print(f"Catalog columns: {self.catalog_df.columns.tolist()}")
+        self._build_filter_arrays()
+    
+    def _build_filter_arrays(self):
+        """Precompute lowercase column arrays so filters don't re-lowercase per query."""
+        self._lower = {}
+        self._codes = {}
+        self._category_values = {}
+        self._value_masks = {}
+        
+        for col in self.FILTER_COLUMNS:
+            if col not in self.catalog_df.columns:
+                continue
+            series = self.catalog_df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Lowercase each category once; code -1 (missing) maps to the trailing ''
+                codes = series.cat.codes.to_numpy()
+                values = np.array([str(c).lower() for c in series.cat.categories] + [''], dtype=object)
+                self._lower[col] = values[codes]
+                self._codes[col] = codes
+                self._category_values[col] = values[:-1].astype(str)
+                
+                # One boolean mask per distinct lowercase value
+                masks = {}
+                for code, value in enumerate(values[:-1]):
+                    value_mask = codes == code
+                    masks[value] = masks[value] | value_mask if value in masks else value_mask
+                self._value_masks[col] = masks
+            else:
+                self._lower[col] = series.fillna('').astype(str).str.lower().to_numpy(dtype=object)
+        
+        if 'price' in self.catalog_df.columns:
+            # float32 halves the bytes scanned per budget lookup; results still report the original price
+            self._price = self.catalog_df['price'].to_numpy(dtype=np.float32)
+        else:
+            self._price = None
+        self._no_match = np.zeros(len(self.catalog_df), dtype=bool)
+        
+        # Inverted index: size token -> mask of rows offering that size
+        self._size_index = {}
+        for row, sizes in enumerate(self._lower.get('available_sizes', [])):
+            for token in sizes.split(','):
+                token = token.strip()
+                if token:
+                    self._size_index.setdefault(token, np.zeros(len(self.catalog_df), dtype=bool))[row] = True
+        
+        # Codes matching a substring are filled in lazily, one entry per (column, needle) pair
+        self._contains_index = {}
+        
+        # Specialize the attribute filters per category once, keeping only columns the catalog has
+        def plan(attributes):
+            return [(attr, col, kind) for attr, col, kind in self.ATTRIBUTE_FILTERS
+                    if attr in attributes and col in self._lower]
+        self._filter_plans = {category: plan(attrs) for category, attrs in self.category_attributes.items()}
+        self._generic_filter_plan = plan(self.GENERIC_FILTER_ATTRIBUTES)
+    
+    def _equals_mask(self, col: str, value: str) -> np.ndarray:
+        """Precomputed mask of rows whose lowercase value equals value."""
+        return self._value_masks[col].get(value, self._no_match)
+    
+    def _matching_codes(self, col: str, needle: str) -> np.ndarray:
+        """Category codes of col whose lowercase value contains needle."""
+        key = (col, needle)
+        # The filter is shared across threads, so never re-read the index after a clear()
+        codes = self._contains_index.get(key)
+        if codes is None:
+            if len(self._contains_index) >= 1024:
+                self._contains_index.clear()
+            # Vectorized substring search over the lowercase category values
+            codes = np.flatnonzero(np.char.find(self._category_values[col], needle) >= 0)
+            self._contains_index[key] = codes
+        return codes
+    
+    def _contains_rows(self, col: str, needles: List[str], idx: np.ndarray) -> np.ndarray:
+        """Mask over the row positions idx whose col value contains any of needles."""
+        codes = self._codes[col][idx]
+        return np.logical_or.reduce([np.isin(codes, self._matching_codes(col, needle)) for needle in needles])
     
     def filter_products(self, attributes: Dict[str, Any], max_results: int = 10) -> List[Dict[str, Any]]:
         """Filter products based on provided attributes."""
-        if self.catalog_df.empty:
-            return []
+        # Canonical, hashable form of the request: sorted items with lists as tuples
+        key = (tuple(sorted(((k, tuple(v) if isinstance(v, list) else v) for k, v in attributes.items()),
+                            key=lambda item: item[0])), max_results)
+        try:
+            results = self._filter_cached(key)
+        except TypeError:
+            # Unhashable attribute values can't be memoized
+            return self._filter_uncached(attributes, max_results)
         
-        filtered_df = self.catalog_df.copy()
+        # Hand out copies so callers can't mutate the cached results
+        return [dict(product) for product in results]
+    
+    def _filter_by_key(self, key) -> List[Dict[str, Any]]:
+        """Run the filter for a canonical key produced by filter_products."""
+        items, max_results = key
+        attributes = {k: list(v) if isinstance(v, tuple) else v for k, v in items}
+        return self._filter_uncached(attributes, max_results)
+    
+    def count_matches(self, attributes: Dict[str, Any]) -> int:
+        """Count products matching the category, budget and size in attributes, ignoring the rest."""
+        if self.catalog_df.empty:
+            return 0
+        category = (attributes.get('category') or '').lower()
+        return int(self._critical_mask(category, attributes.get('budget'), attributes.get('size')).sum())
+    
+    def _critical_mask(self, category: str, budget: Any, size: Any) -> np.ndarray:
+        """Mask of rows matching the lowercase category, budget and size; falsy values don't filter."""
+        lower = self._lower
+        mask = np.ones(len(self.catalog_df), dtype=bool)
         
-        # Apply filters based on attributes
-        if 'category' in attributes and attributes['category']:
-            category = attributes['category'].lower()
-            filtered_df = filtered_df[filtered_df['category'].str.lower().eq(category)]
+        if category and 'category' in lower:
+            mask &= self._equals_mask('category', category)
         
-        if 'budget' in attributes and attributes['budget']:
+        if budget and self._price is not None:
             try:
-                budget = float(attributes['budget'])
-                filtered_df = filtered_df[filtered_df['price'] <= budget]
+                budget = float(budget)
+                # Prices are sorted ascending (missing prices last), so drop everything past the cutoff;
+                # a NaN budget matches nothing, like the plain <= comparison did
+                cutoff = np.searchsorted(self._price, np.float32(budget), side='right') if budget == budget else 0
+                mask[cutoff:] = False
             except (ValueError, TypeError):
                 pass
         
-        if 'size' in attributes and attributes['size']:
-            size = str(attributes['size'])
-            size_mask = filtered_df['available_sizes'].str.contains(size, case=False, na=False)
-            filtered_df = filtered_df[size_mask]
-        
-        # Apply category-specific filters
-        current_category = attributes.get('category', '').lower()
-        
-        # Fit filter (for categories that have it)
-        if 'fit' in attributes and attributes['fit'] and current_category in ['top', 'dress', 'pants'] and 'fit' in filtered_df.columns:
-            fit = attributes['fit'].lower()
-            filtered_df = filtered_df[filtered_df['fit'].str.lower().eq(fit)]
-        
-        # Fabric filter (only if fabric column exists in catalog)
-        if 'fabric' in attributes and attributes['fabric'] and 'fabric' in filtered_df.columns:
-            fabric = attributes['fabric']
-            if isinstance(fabric, list):
-                # Handle list of fabrics
-                fabric_mask = pd.Series([False] * len(filtered_df), index=filtered_df.index)
-                for f in fabric:
-                    fabric_mask = fabric_mask | filtered_df['fabric'].str.lower().str.contains(f.lower(), na=False)
-                filtered_df = filtered_df[fabric_mask]
-            else:
-                fabric_mask = filtered_df['fabric'].str.lower().str.contains(fabric.lower(), na=False)
-                filtered_df = filtered_df[fabric_mask]
-        
-        # Color or print filter
-        if 'color_or_print' in attributes and attributes['color_or_print']:
-            color_print = attributes['color_or_print']
-            if isinstance(color_print, list):
-                # Handle list of colors/prints
-                color_mask = pd.Series([False] * len(filtered_df), index=filtered_df.index)
-                for cp in color_print:
-                    color_mask = color_mask | filtered_df['color'].str.lower().str.contains(cp.lower(), na=False)
-                filtered_df = filtered_df[color_mask]
-            else:
-                color_mask = filtered_df['color'].str.lower().str.contains(color_print.lower(), na=False)
-                filtered_df = filtered_df[color_mask]
-        
-        # Sleeve length filter (for tops and dresses)
-        if 'sleeve_length' in attributes and attributes['sleeve_length'] and current_category in ['top', 'dress'] and 'sleeve_length' in filtered_df.columns:
-            sleeve = attributes['sleeve_length'].lower()
-            sleeve_mask = filtered_df['sleeve_length'].str.lower().str.contains(sleeve, na=False)
-            filtered_df = filtered_df[sleeve_mask]
-        
-        # Neckline filter (for dresses)
-        if 'neckline' in attributes and attributes['neckline'] and current_category == 'dress' and 'neckline' in filtered_df.columns:
-            neckline = attributes['neckline'].lower()
-            neckline_mask = filtered_df['neckline'].str.lower().str.contains(neckline, na=False)
-            filtered_df = filtered_df[neckline_mask]
-        
-        # Length filter (for skirts)
-        if 'length' in attributes and attributes['length'] and current_category == 'skirt' and 'length' in filtered_df.columns:
-            length = attributes['length']
-            if isinstance(length, list):
-                length_mask = filtered_df['length'].isin(length)
+        if size and 'available_sizes' in lower:
+            mask &= self._size_index.get(str(size).strip().lower(), self._no_match)
+        
+        return mask
+    
+    def _filter_uncached(self, attributes: Dict[str, Any], max_results: int) -> List[Dict[str, Any]]:
+        """Evaluate the attribute filters against the catalog."""
+        if self.catalog_df.empty:
+            return []
+        
+        category = (attributes.get('category') or '').lower()
+        
+        # Cheap predicates first: precomputed masks and the numeric budget comparison
+        mask = self._critical_mask(category, attributes.get('budget'), attributes.get('size'))
+        
+        # Category-specific filters from the plan precomputed for this category
+        substring_filters = []
+        for attr, col, kind in self._filter_plans.get(category, self._generic_filter_plan):
+            value = attributes.get(attr)
+            if not value:
+                continue
+            values = [v.lower() for v in value] if isinstance(value, list) else [value.lower()]
+            if kind == 'equals':
+                mask &= np.logical_or.reduce([self._equals_mask(col, v) for v in values])
             else:
-                length_mask = filtered_df['length'].str.lower().eq(length.lower())
-            filtered_df = filtered_df[length_mask]
-        
-        # Pant type filter (for pants)
-        if 'pant_type' in attributes and attributes['pant_type'] and current_category == 'pants' and 'pant_type' in filtered_df.columns:
-            pant_type = attributes['pant_type'].lower()
-            pant_type_mask = filtered_df['pant_type'].str.lower().str.contains(pant_type, na=False)
-            filtered_df = filtered_df[pant_type_mask]
-        
-        # Occasion filter (for dresses)
-        if 'occasion' in attributes and attributes['occasion'] and current_category == 'dress' and 'occasion' in filtered_df.columns:
-            occasion = attributes['occasion'].lower()
-            occasion_mask = filtered_df['occasion'].str.lower().str.contains(occasion, na=False)
-            filtered_df = filtered_df[occasion_mask]
-        
-        # Sort and limit results
-        if 'price' in filtered_df.columns:
-            filtered_df = filtered_df.sort_values('price')
-        
-        filtered_df = filtered_df.head(max_results)
-        
-        # Convert to list of dictionaries
-        results = []
-        for _, row in filtered_df.iterrows():
-            product = {
-                'product_id': row.get('product_id', ''),
-                'name': row.get('name', ''),
-                'category': row.get('category', ''),
-                'price': row.get('price', 0),
-                'available_sizes': row.get('available_sizes', ''),
-                'fit': row.get('fit', ''),
-                'fabric': row.get('fabric', ''),
-                'sleeve_length': row.get('sleeve_length', ''),
-                'color_or_print': row.get('color', ''),  # Column is 'color' not 'color_or_print'
-                'occasion': row.get('occasion', ''),
-                'neckline': row.get('neckline', ''),
-                'length': row.get('length', ''),
-                'pant_type': row.get('pant_type', ''),
-                'description': f"{row.get('fabric', '')} {row.get('category', '')} in {row.get('color', '')}"
-            }
-            results.append(product)
-        
-        return results
+                # Substring predicates run later, only on rows that survived the cheap ones
+                substring_filters.append((col, values))
+        
+        idx = np.flatnonzero(mask)
+        for col, needles in substring_filters:
+            if not len(idx):
+                return []
+            idx = idx[self._contains_rows(col, needles, idx)]
+        
+        # Rows are already in price order; limit results, indexing the catalog once
+        filtered_df = self.catalog_df.iloc[idx[:max_results]]
+        
+        # Convert to list of dictionaries in one pass; missing columns default to ''
+        records = filtered_df.reindex(columns=self.RESULT_COLUMNS, fill_value='')
+        if 'price' not in filtered_df.columns:
+            records['price'] = 0
+        records['description'] = (
+            records['fabric'].astype(object).fillna('').astype(str) + ' ' +
+            records['category'].astype(object).fillna('').astype(str) + ' in ' +
+            records['color'].astype(object).fillna('').astype(str)
+        )
+        # Column is 'color' in the catalog but 'color_or_print' everywhere else
+        records = records.rename(columns={'color': 'color_or_print'})
+        
+        return records.to_dict(orient='records')
     
     def get_catalog_summary(self) -> Dict[str, Any]:
         """Get summary statistics of the catalog."""
@@ -6,6 +6,7 @@ when rule-based matching doesn't provide sufficient confidence.
 """
 
 from openai import OpenAI
+import httpx
 import json
 import os
 from typing import Dict, List, Optional, Any
@@ -14,6 +15,47 @@ import dotenv
 dotenv.load_dotenv()
 
 class GPTInference:
+    MODEL = "gpt-4"
+    
+    # Static part of the system prompt; only the vibe mappings section varies per call
+    BASE_SYSTEM_PROMPT = """You are a fashion stylist AI that converts natural language requests into structured fashion attributes.
+
+IMPORTANT RULES:
+1. Only return valid JSON with no additional text
+2. Only use attributes that are valid for the specified category
+3. Use EXACT values from the provided lists
+4. If unsure about a value, omit that attribute rather than guessing
+
+CATEGORIES AND THEIR VALID ATTRIBUTES:
+- top: fit, fabric, sleeve_length, color_or_print
+- dress: fit, fabric, sleeve_length, color_or_print, occasion, neckline  
+- skirt: fabric, color_or_print, length
+- pants: fit, fabric, color_or_print, pant_type
+
+VALID VALUES FOR ATTRIBUTES:
+
+Fit: Relaxed, Stretch to fit, Body hugging, Tailored, Oversized, Flowy, Bodycon, Slim, Sleek and straight
+
+Fabric: Linen, Silk, Cotton, Rayon, Satin, Modal jersey, Crepe, Tencel, Chambray, Velvet, Chiffon, Denim, Wool-blend, Sequined velvet, Tulle, Organic cotton, Viscose, Cotton poplin, Linen blend, Cotton gauze, Ribbed jersey, Lace overlay, Tencel twill
+
+Sleeve Length: Sleeveless, Spaghetti straps, Straps, Short sleeves, Short flutter sleeves, Cap sleeves, Quarter sleeves, Long sleeves, Full sleeves, Cropped, Bishop sleeves, Balloon sleeves, Bell sleeves, Halter, Tube, One-shoulder
+
+Neckline: V neck, Sweetheart, Square neck, Boat neck, Tubetop, Halter, Cowl neck, Collar, One-shoulder, Polo collar, Illusion bateau, Round neck
+
+Length: Mini, Short, Midi, Maxi
+
+Pant Type: Wide-legged, Ankle length, Flared, Wide hem, Straight ankle, Mid-rise, Low-rise
+
+Occasion: Party, Vacation, Everyday, Evening, Work, Vocation
+
+Color/Print examples: Pastel yellow, Deep blue, Floral print, Red, Off-white, Midnight navy sequin, Sapphire blue, Ruby red, etc.
+
+EXAMPLE RESPONSES:
+For "casual summer top": {"category": "top", "fit": "Relaxed", "fabric": "Linen", "sleeve_length": "Short sleeves"}
+For "elegant evening dress": {"category": "dress", "fit": "Body hugging", "fabric": "Silk", "occasion": "Evening", "neckline": "V neck"}
+For "comfortable wide leg pants": {"category": "pants", "fit": "Relaxed", "pant_type": "Wide-legged"}
+"""
+    
     def __init__(self, api_key: Optional[str] = None):
         """
         Initialize GPT inference with API configuration.
@@ -24,7 +66,13 @@ class GPTInference:
         self.api_key = api_key or os.getenv('openai_api_key')
         
         if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
+            # One client per instance so requests reuse pooled keep-alive connections
+            self.client = OpenAI(
+                api_key=self.api_key,
+                http_client=httpx.Client(
+                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+                )
+            )
             self.available = True
             print("GPT inference initialized successfully")
         else:
@@ -51,6 +99,16 @@ class GPTInference:
             'pant_type': ['Wide-legged', 'Ankle length', 'Flared', 'Wide hem', 'Straight ankle', 'Mid-rise', 'Low-rise'],
             'occasion': ['Party', 'Vacation', 'Everyday', 'Evening', 'Work', 'Vocation']
         }
+        # Validation only does membership tests, so use sets for O(1) lookups
+        self.valid_values = {k: frozenset(v) for k, v in self.valid_values.items()}
+        self._category_attribute_sets = {k: frozenset(v) for k, v in self.category_attributes.items()}
+        
+        # Last vibe mappings seen and the system prompt built from them
+        self._mappings_prompt = (None, self.BASE_SYSTEM_PROMPT)
+        # Validated attributes for queries already sent to GPT
+        self._response_cache = {}
+        # File id of the catalog once uploaded
+        self._catalog_file_id = None
     
     def infer_attributes(self, 
                         user_query: str, 
@@ -72,32 +130,35 @@ class GPTInference:
         
         existing_attributes = existing_attributes or {}
         
+        # Create system prompt with context; it embeds the mappings, so it also keys the cache
+        system_prompt = self._create_system_prompt(vibe_mappings)
+        
+        # Identical requests get the same answer, so skip the round-trip. The cache may be
+        # cleared by another thread, so read it once
+        cache_key = (user_query, json.dumps(existing_attributes, sort_keys=True, default=str), system_prompt)
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            return self._copy_attributes(cached)
+        
         try:
-            # Create system prompt with context
-            system_prompt = self._create_system_prompt(vibe_mappings)
-            
             # Create user prompt
             user_prompt = self._create_user_prompt(user_query, existing_attributes)
-            with open("data/apparels_shared.xlsx", "rb") as f:
-                upload_response = self.client.files.create(
-                    file=f,
-                    purpose="assistants"   # use "assistants" for the Assistants API, or "fine-tune"/"embeddings" etc. depending on your use case
-                )
-            file_id = upload_response.id
+            file_id = self._get_catalog_file_id()
             # Call GPT using new API format
             response = self.client.chat.completions.create(
-                model="gpt-4",
+                model=self.MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.3,
                 max_tokens=500,
-                file_ids=[file_id]
+                file_ids=[file_id],
+                stream=True
             )
             
-            # Parse response
-            result_text = response.choices[0].message.content.strip()
+            # Parse response as it streams in, stopping once the JSON object is complete
+            result_text = self._read_json_stream(response).strip()
             
             # Try to extract JSON from response
             try:
@@ -112,6 +173,9 @@ class GPTInference:
                 validated_attributes = self._validate_attributes(attributes)
                 
                 print(f"GPT inferred attributes: {validated_attributes}")
+                if len(self._response_cache) >= 256:
+                    self._response_cache.clear()
+                self._response_cache[cache_key] = self._copy_attributes(validated_attributes)
                 return validated_attributes
                 
             except json.JSONDecodeError:
@@ -122,51 +186,73 @@ class GPTInference:
             print(f"GPT inference error: {e}")
             return None
     
-    def _create_system_prompt(self, vibe_mappings: Optional[Dict] = None) -> str:
-        """Create system prompt with context about fashion attributes."""
+    def _get_catalog_file_id(self) -> str:
+        """Upload the catalog on first use and reuse its file id afterwards."""
+        if self._catalog_file_id is None:
+            with open("data/apparels_shared.xlsx", "rb") as f:
+                upload_response = self.client.files.create(
+                    file=f,
+                    purpose="assistants"   # use "assistants" for the Assistants API, or "fine-tune"/"embeddings" etc. depending on your use case
+                )
+            self._catalog_file_id = upload_response.id
+        return self._catalog_file_id
+    
+    def _read_json_stream(self, stream) -> str:
+        """
+        Accumulate streamed completion text until the first JSON object closes.
         
-        prompt = """You are a fashion stylist AI that converts natural language requests into structured fashion attributes.
-
-IMPORTANT RULES:
-1. Only return valid JSON with no additional text
-2. Only use attributes that are valid for the specified category
-3. Use EXACT values from the provided lists
-4. If unsure about a value, omit that attribute rather than guessing
-
-CATEGORIES AND THEIR VALID ATTRIBUTES:
-- top: fit, fabric, sleeve_length, color_or_print
-- dress: fit, fabric, sleeve_length, color_or_print, occasion, neckline  
-- skirt: fabric, color_or_print, length
-- pants: fit, fabric, color_or_print, pant_type
-
-VALID VALUES FOR ATTRIBUTES:
-
-Fit: Relaxed, Stretch to fit, Body hugging, Tailored, Oversized, Flowy, Bodycon, Slim, Sleek and straight
-
-Fabric: Linen, Silk, Cotton, Rayon, Satin, Modal jersey, Crepe, Tencel, Chambray, Velvet, Chiffon, Denim, Wool-blend, Sequined velvet, Tulle, Organic cotton, Viscose, Cotton poplin, Linen blend, Cotton gauze, Ribbed jersey, Lace overlay, Tencel twill
-
-Sleeve Length: Sleeveless, Spaghetti straps, Straps, Short sleeves, Short flutter sleeves, Cap sleeves, Quarter sleeves, Long sleeves, Full sleeves, Cropped, Bishop sleeves, Balloon sleeves, Bell sleeves, Halter, Tube, One-shoulder
-
-Neckline: V neck, Sweetheart, Square neck, Boat neck, Tubetop, Halter, Cowl neck, Collar, One-shoulder, Polo collar, Illusion bateau, Round neck
-
-Length: Mini, Short, Midi, Maxi
-
-Pant Type: Wide-legged, Ankle length, Flared, Wide hem, Straight ankle, Mid-rise, Low-rise
-
-Occasion: Party, Vacation, Everyday, Evening, Work, Vocation
-
-Color/Print examples: Pastel yellow, Deep blue, Floral print, Red, Off-white, Midnight navy sequin, Sapphire blue, Ruby red, etc.
-
-EXAMPLE RESPONSES:
-For "casual summer top": {"category": "top", "fit": "Relaxed", "fabric": "Linen", "sleeve_length": "Short sleeves"}
-For "elegant evening dress": {"category": "dress", "fit": "Body hugging", "fabric": "Silk", "occasion": "Evening", "neckline": "V neck"}
-For "comfortable wide leg pants": {"category": "pants", "fit": "Relaxed", "pant_type": "Wide-legged"}
-"""
+        Returns just that object when its braces balance; otherwise the full text,
+        which the caller cleans up (code fences etc.) as before.
+        """
+        parts = []
+        start = None
+        depth = 0
+        in_string = escaped = False
+        offset = 0
+        
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ''
+            parts.append(delta)
+            
+            for i, ch in enumerate(delta):
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif ch == '\\':
+                        escaped = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch == '"':
+                    in_string = start is not None
+                elif ch == '{':
+                    if start is None:
+                        start = offset + i
+                    depth += 1
+                elif ch == '}' and start is not None:
+                    depth -= 1
+                    if depth == 0:
+                        # Object complete: stop reading the rest of the response
+                        if hasattr(stream, 'close'):
+                            stream.close()
+                        return ''.join(parts)[start:offset + i + 1]
+            offset += len(delta)
         
-        if vibe_mappings:
-            prompt += f"\n\nAVAILABLE VIBE MAPPINGS FOR CONTEXT:\n{json.dumps(vibe_mappings, indent=2)}"
+        return ''.join(parts)
+    
+    def _create_system_prompt(self, vibe_mappings: Optional[Dict] = None) -> str:
+        """Create system prompt with context about fashion attributes."""
+        if not vibe_mappings:
+            return self.BASE_SYSTEM_PROMPT
         
-        return prompt
+        # Mappings are long-lived, so serialize them once per mappings object; compact
+        # separators keep indentation whitespace out of the prompt tokens
+        if self._mappings_prompt[0] is not vibe_mappings:
+            mappings_json = json.dumps(vibe_mappings, separators=(',', ':'))
+            self._mappings_prompt = (vibe_mappings, self.BASE_SYSTEM_PROMPT +
+                                     f"\n\nAVAILABLE VIBE MAPPINGS FOR CONTEXT:\n{mappings_json}")
+        return self._mappings_prompt[1]
     
     def _create_user_prompt(self, user_query: str, existing_attributes: Dict[str, Any]) -> str:
         """Create user prompt with query and existing attributes."""
@@ -181,13 +267,18 @@ For "comfortable wide leg pants": {"category": "pants", "fit": "Relaxed", "pant_
         
         return prompt
     
+    @staticmethod
+    def _copy_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy an attributes dict, including list values, so cached entries stay untouched."""
+        return {k: list(v) if isinstance(v, list) else v for k, v in attributes.items()}
+    
     def _validate_attributes(self, attributes: Dict[str, Any]) -> Dict[str, Any]:
         """Validate attributes against known valid values and category constraints."""
         validated = {}
         
         # Get category to determine valid attributes
         category = attributes.get('category', '').lower()
-        valid_attrs = self.category_attributes.get(category, [])
+        valid_attrs = self._category_attribute_sets.get(category, frozenset())
         
         for attr, value in attributes.items():
             attr_lower = attr.lower()
@@ -202,13 +293,13 @@ For "comfortable wide leg pants": {"category": "pants", "fit": "Relaxed", "pant_
                     # For list values, validate each item
                     validated_list = []
                     for item in value:
-                        if item in self.valid_values[attr_lower]:
+                        if isinstance(item, str) and item in self.valid_values[attr_lower]:
                             validated_list.append(item)
                     if validated_list:
                         validated[attr] = validated_list
                 else:
                     # For single values
-                    if value in self.valid_values[attr_lower]:
+                    if isinstance(value, str) and value in self.valid_values[attr_lower]:
                         validated[attr] = value
             else:
                 # For attributes not in valid_values (like color_or_print), keep as-is
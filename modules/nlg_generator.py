@@ -6,6 +6,7 @@ suggestions for the user. Creates friendly, informative responses.
 """
 
 from typing import Dict, List, Optional, Any
+import functools
 import random
 
 class NLGGenerator:
@@ -13,6 +14,8 @@ class NLGGenerator:
         """Initialize the natural language generator."""
         self.templates = self._init_templates()
         self.attribute_descriptions = self._init_attribute_descriptions()
+        self._stopwords = frozenset({'something', 'for', 'a', 'an', 'the', 'i', 'need', 'want'})
+        self._context_cached = functools.lru_cache(maxsize=256)(self._build_context)
     
     def _init_templates(self) -> Dict[str, List[str]]:
         """Initialize response templates for different scenarios."""
@@ -65,24 +68,20 @@ class NLGGenerator:
     
     def _extract_context(self, query: str, attributes: Dict[str, Any]) -> str:
         """Extract context description from query and attributes."""
-        context_parts = []
-        
-        if 'occasion' in attributes:
-            occasion = attributes['occasion'].lower()
-            if occasion in self.attribute_descriptions['occasion']:
-                context_parts.append(self.attribute_descriptions['occasion'][occasion])
-            else:
-                context_parts.append(occasion)
-        
-        if not context_parts:
-            key_words = [word for word in query.lower().split() 
-                        if word not in ['something', 'for', 'a', 'an', 'the', 'i', 'need', 'want']]
-            if key_words:
-                return ' '.join(key_words[:3])
-            else:
-                return "your request"
-        
-        return ', '.join(context_parts)
+        # Only the occasion feeds into the context, so memoize on (query, occasion)
+        return self._context_cached(query, attributes.get('occasion'))
+    
+    def _build_context(self, query: str, occasion: Optional[str]) -> str:
+        """Build the context description for a query and optional occasion."""
+        if occasion:
+            occasion = occasion.lower()
+            return self.attribute_descriptions['occasion'].get(occasion, occasion)
+        
+        key_words = [word for word in query.lower().split() if word not in self._stopwords]
+        if key_words:
+            return ' '.join(key_words[:3])
+        else:
+            return "your request"
     
     def _generate_single_product_response(self, product: Dict[str, Any], context: str, attributes: Dict[str, Any]) -> str:
         """Generate response for a single product recommendation."""
@@ -105,17 +104,16 @@ class NLGGenerator:
         intro_template = random.choice(self.templates['multiple_products'])
         intro = intro_template.format(count=len(products), context=context)
         
-        product_lines = []
-        for product in products[:3]:
-            description = self._create_brief_description(product)
-            item_template = random.choice(self.templates['product_item'])
-            
-            product_line = item_template.format(
+        # One item template per response keeps the list consistent and avoids a draw per line
+        item_template = random.choice(self.templates['product_item'])
+        product_lines = [
+            item_template.format(
                 name=product['name'],
-                description=description,
+                description=self._create_brief_description(product),
                 price=product['price']
             )
-            product_lines.append(product_line)
+            for product in products[:3]
+        ]
         
         return intro + "\n\n" + "\n".join(product_lines)
     
@@ -6,38 +6,79 @@ using spaCy for tokenization, POS tagging, and entity extraction.
 """
 
 import spacy
-import re, os
+import numpy as np
+import gc
+import copy
+import functools
+import re
+import string
 from typing import Dict, List, Optional, Any
-import nltk
-from nltk.corpus import stopwords
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
 
-# 1. Choose a local path inside your app directory
-NLTK_DATA = os.path.join(os.getcwd(), "nltk_data")
+@functools.lru_cache(maxsize=None)
+def _get_nlp():
+    """Load the spaCy pipeline once per process."""
+    # POS tags and noun chunks need the tagger, parser and attribute_ruler,
+    # but entities and lemmas are never used
+    return spacy.load("en_core_web_md", disable=["ner", "lemmatizer"])
 
-# 2. Make sure it exists
-os.makedirs(NLTK_DATA, exist_ok=True)
+# Curly apostrophes mapped to straight ones
+_APOSTROPHES = str.maketrans({'’': "'"})
 
-# 3. Tell NLTK where to download and look for data
-nltk.data.path.insert(0, NLTK_DATA)
+# Punctuation (apostrophes excepted) mapped to spaces, for splitting text into words
+_PUNCTUATION_TO_SPACE = str.maketrans({c: ' ' for c in string.punctuation.replace("'", '') + '“”‘—–…'})
+
+# Runs of whitespace, collapsed to a single space
+_WS_RE = re.compile(r'\s+')
+
+# Common budget patterns, in priority order: an explicit $ amount wins over the other
+# phrasings wherever it appears in the query
+_BUDGET_PATTERNS = tuple(re.compile(pattern) for pattern in [
+    r'\$(\d+(?:\.\d{2})?)',  # $100, $99.99
+    r'(\d+(?:\.\d{2})?)\s*dollars?',  # 100 dollars, 100.50 dollar
+    r'under\s*\$?(\d+(?:\.\d{2})?)',  # under $100, under 100
+    r'below\s*\$?(\d+(?:\.\d{2})?)',  # below $100, below 100
+    r'less\s*than\s*\$?(\d+(?:\.\d{2})?)',  # less than $100, less than 100
+    r'budget\s*of\s*\$?(\d+(?:\.\d{2})?)',  # budget of $100, budget of 100
+    r'around\s*\$?(\d+(?:\.\d{2})?)',  # around $100, around 100
+    r'up\s*to\s*\$?(\d+(?:\.\d{2})?)',  # up to $100, up to 100
+    r'max\s*\$?(\d+(?:\.\d{2})?)',  # max $100, max 100
+])
+
+def extract_budget(text: str) -> Optional[float]:
+    """Extract a budget amount from text, trying the patterns in priority order."""
+    text_lower = text.lower()
+    for pattern in _BUDGET_PATTERNS:
+        match = pattern.search(text_lower)
+        if match:
+            return float(match.group(1))
+    return None
+
+def _word_alternation(words: List[str]) -> str:
+    """Build a regex alternation matching any of the words or phrases as whole words."""
+    # Longest first so 'long sleeves' wins over 'sleeves' and 'tops' over 'top' at the same spot
+    alternatives = sorted({w.lower() for w in words}, key=len, reverse=True)
+    body = '|'.join(re.escape(w).replace(r'\ ', r'\s+') for w in alternatives)
+    # Not inside a word or right after an apostrophe, so "women's" and "i'm" don't read as sizes
+    return rf"(?<![\w'’])(?:{body})(?!\w)"
+
+def _compile_vocabulary(words: List[str]) -> re.Pattern:
+    """Compile a word list into one case-insensitive regex matching whole words or phrases."""
+    return re.compile(_word_alternation(words), re.IGNORECASE)
 
 class NLPAnalyzer:
-    def __init__(self):
-        """Initialize the NLP analyzer with spaCy model and NLTK components."""
+    def __init__(self, nlp=None):
+        """Initialize the NLP analyzer with the spaCy model, or reuse an already loaded one."""
         try:
-            # Load spaCy English model (download if needed)
-            self.nlp = spacy.load("en_core_web_md")
+            # Load spaCy English model (download if needed) unless a loaded one is passed in
+            self.nlp = nlp if nlp is not None else _get_nlp()
         except OSError:
             print("spaCy English model not found. Please install it with: python -m spacy download en_core_web_md")
             raise
         
-        # Initialize NLTK components
-        try:
-            nltk.download("stopwords", download_dir=NLTK_DATA, quiet=True)
-            nltk.download("punkt",     download_dir=NLTK_DATA, quiet=True)
-            self.stop_words = set(stopwords.words('english'))
-        except Exception as e:
-            print(f"NLTK setup warning: {e}")
-            self.stop_words = set(['a', 'an', 'the', 'for', 'in', 'on', 'at', 'to', 'with'])
+        # Static English stopword list (scikit-learn is already a dependency), so
+        # construction needs no corpus download or disk lookups
+        self.stop_words = ENGLISH_STOP_WORDS
         
         # Fashion-specific entity patterns
         self.fashion_patterns = self._init_fashion_patterns()
@@ -52,6 +93,57 @@ class NLPAnalyzer:
             'coverage':   'coverage',
             'size':       'sizes'
         }
+        
+        # Repeated queries (reruns, retries) reuse the previous analysis
+        self._analyze_cached = functools.lru_cache(maxsize=1024)(self._analyze_query)
+        
+        # Unit vectors for every vocabulary entry, so confidence scoring is one dot product
+        self._pattern_vectors = {
+            pattern_key: self._unit_vectors(self.fashion_patterns[pattern_key])
+            for pattern_key in self._attr_map.values()
+        }
+        
+        # Normalize size mentions to standard format (XS, S, M, L, XL, XXL)
+        self._size_map = {
+            'xs': 'XS', 'extra small': 'XS', 'size xs': 'XS',
+            's': 'S', 'small': 'S', 'size s': 'S',
+            'm': 'M', 'medium': 'M', 'size m': 'M',
+            'l': 'L', 'large': 'L', 'size l': 'L',
+            'xl': 'XL', 'extra large': 'XL', 'size xl': 'XL',
+            'xxl': 'XXL', 'extra extra large': 'XXL', '2xl': 'XXL', 'size xxl': 'XXL'
+        }
+        
+        # A season followed by an occasion, either adjacent or one word apart,
+        # e.g. "summer brunch" or "winter beach wedding"
+        self._season_occasion_re = re.compile(
+            rf"({_word_alternation(self.fashion_patterns['seasons'])})\s+(?:\w+\s+)?"
+            rf"({_word_alternation(self.fashion_patterns['occasions'])})",
+            re.IGNORECASE
+        )
+        
+        # Common filler phrases stripped from queries by clean_text
+        filler_phrases = [
+            'i want', 'i need', "i'm looking for", 'looking for',
+            'can you find', 'help me find', 'show me', 'find me',
+            'could you find', 'could you show me', 'do you have',
+            'i would like', 'i’m interested in', 'would you please',
+            'would you mind', 'give me', 'tell me about', 'what’s available',
+            'what do you have for', 'any recommendations for',
+            'do you know', 'please find', 'please show', 'please help me',
+            'let me see', 'i’m curious about', 'i’m searching for',
+            'looking to', 'seek', 'seeking', 'i’m hunting for'
+        ]
+        filler_phrases = [p.translate(_APOSTROPHES) for p in filler_phrases]
+        self._filler_re = _compile_vocabulary(filler_phrases)
+        # Queries containing none of these words can't contain a filler phrase
+        self._filler_first_words = frozenset(p.split()[0] for p in filler_phrases)
+        
+        # One compiled regex per vocabulary, scanned once per query instead of per token;
+        # every size spelling is a key of the size map, so sizes are matched straight from it
+        self._category_regex = {
+            attr: _compile_vocabulary(list(self._size_map) if attr == 'size' else self.fashion_patterns[pattern_key])
+            for attr, pattern_key in self._attr_map.items()
+        }
     
     def _init_fashion_patterns(self) -> Dict[str, List[str]]:
         """Initialize fashion-specific patterns and keywords."""
@@ -91,34 +183,21 @@ class NLPAnalyzer:
     
     def clean_text(self, text: str) -> str:
         """Clean and normalize the input text."""
-        # Convert to lowercase
-        text = text.lower().strip()
+        # Convert to lowercase, with curly apostrophes straightened so fillers match either form
+        text = text.lower().translate(_APOSTROPHES)
         
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove some common filler phrases
-        filler_phrases = [
-            'i want', 'i need', "i'm looking for", 'looking for',
-            'can you find', 'help me find', 'show me', 'find me',
-            'could you find', 'could you show me', 'do you have',
-            'i would like', 'i’m interested in', 'would you please',
-            'would you mind', 'give me', 'tell me about', 'what’s available',
-            'what do you have for', 'any recommendations for',
-            'do you know', 'please find', 'please show', 'please help me',
-            'let me see', 'i’m curious about', 'i’m searching for',
-            'looking to', 'seek', 'seeking', 'i’m hunting for'
-        ]
+        # Remove some common filler phrases in a single pass, skipping the regex
+        # when no word could start one (e.g. "red dress under $50")
+        if not self._filler_first_words.isdisjoint(text.translate(_PUNCTUATION_TO_SPACE).split()):
+            text = self._filler_re.sub(' ', text)
         
-        for phrase in filler_phrases:
-            text = text.replace(phrase, '')
+        # Remove extra whitespace
+        text = _WS_RE.sub(' ', text)
         
         return text.strip()
     
     def extract_key_phrases(self, text: str) -> Dict[str, Any]:
         """Extract key fashion-related phrases from the text using spaCy."""
-        doc = self.nlp(text)
-        
         extracted = {
             'occasion': None,
             'season': None,
@@ -133,95 +212,46 @@ class NLPAnalyzer:
             'adjectives': []
         }
         
-        # Extract noun chunks (potentially meaningful phrases)
-        for chunk in doc.noun_chunks:
-            chunk_text = chunk.text.lower()
-            extracted['noun_chunks'].append(chunk_text)
-            
-            # Check for compound phrases (season + occasion)
-            if any(season in chunk_text for season in self.fashion_patterns['seasons']) and \
-               any(occasion in chunk_text for occasion in self.fashion_patterns['occasions']):
-                extracted['raw_phrases'].append(chunk_text)
-        
-        # Extract adjectives (style descriptors)
-        for token in doc:
-            if token.pos_ == 'ADJ' and token.text.lower() not in self.stop_words:
-                extracted['adjectives'].append(token.text.lower())
-        
-        # Match against fashion patterns
-        # Don't filter out fashion-related words even if they're stop words
-        all_fashion_words = set()
-        for pattern_list in self.fashion_patterns.values():
-            all_fashion_words.update(pattern_list)
-        
-        tokens = [token.text.lower() for token in doc if not token.is_punct and 
-                 (not token.is_stop or token.text.lower() in all_fashion_words)]
-        
-        for token in tokens:
-            # Check occasions
-            if token in self.fashion_patterns['occasions'] and not extracted['occasion']:
-                extracted['occasion'] = token
-            
-            # Check seasons
-            if token in self.fashion_patterns['seasons'] and not extracted['season']:
-                extracted['season'] = token
-            
-            # Check styles
-            if token in self.fashion_patterns['styles'] and not extracted['style']:
-                extracted['style'] = token
-            
-            # Check categories
-            if token in self.fashion_patterns['categories'] and not extracted['category']:
-                extracted['category'] = token
+        # Noun chunks and adjectives need the parser; without a model only the vocabularies below apply
+        if self.nlp is not None:
+            doc = self.nlp(text)
             
-            # Check fits
-            if token in self.fashion_patterns['fits'] and not extracted['fit']:
-                extracted['fit'] = token
-            
-            # Check colors
-            if token in self.fashion_patterns['colors'] and not extracted['color']:
-                extracted['color'] = token
-            
-            # Check coverage
-            if token in self.fashion_patterns['coverage'] and not extracted['coverage']:
-                extracted['coverage'] = token
-            
-            # Check sizes - improved logic to handle lowercase inputs
-            if not extracted['size']:
-                # Normalize size to standard format (XS, S, M, L, XL, XXL)
-                size_mapping = {
-                    'xs': 'XS', 'extra small': 'XS', 'size xs': 'XS',
-                    's': 'S', 'small': 'S', 'size s': 'S',
-                    'm': 'M', 'medium': 'M', 'size m': 'M',
-                    'l': 'L', 'large': 'L', 'size l': 'L',
-                    'xl': 'XL', 'extra large': 'XL', 'size xl': 'XL',
-                    'xxl': 'XXL', 'extra extra large': 'XXL', '2xl': 'XXL', 'size xxl': 'XXL'
-                }
+            # Extract noun chunks (potentially meaningful phrases)
+            for chunk in doc.noun_chunks:
+                chunk_text = chunk.text.lower()
+                extracted['noun_chunks'].append(chunk_text)
                 
-                # Check if token is a size (either in patterns or mapping)
-                if token in size_mapping or token.upper() in self.fashion_patterns['sizes']:
-                    extracted['size'] = size_mapping.get(token, token.upper())
+                # Check for compound phrases (season + occasion)
+                if self._category_regex['season'].search(chunk_text) and self._category_regex['occasion'].search(chunk_text):
+                    extracted['raw_phrases'].append(chunk_text)
+            
+            # Extract adjectives (style descriptors)
+            for token in doc:
+                if token.pos_ == 'ADJ' and token.text.lower() not in self.stop_words:
+                    extracted['adjectives'].append(token.text.lower())
+        
+        # Match against fashion patterns: the first mention of each attribute wins
+        for attr, regex in self._category_regex.items():
+            match = regex.search(text)
+            if match:
+                value = _WS_RE.sub(' ', match.group(0).lower())
+                if attr == 'size':
+                    value = self._size_map[value]
+                extracted[attr] = value
         
         # Look for compound phrases
-        text_lower = text.lower()
         for chunk in extracted['noun_chunks']:
             if len(chunk.split()) > 1:  # Multi-word phrases
                 extracted['raw_phrases'].append(chunk)
         
         # Special handling for compound season-occasion phrases
-        season_occasion_patterns = [
-            'summer brunch', 'winter formal', 'spring wedding', 'fall party',
-            'summer party', 'winter date', 'spring casual', 'fall formal'
-        ]
-        
-        for pattern in season_occasion_patterns:
-            if pattern in text_lower:
-                extracted['raw_phrases'].append(pattern)
-                words = pattern.split()
-                if words[0] in self.fashion_patterns['seasons']:
-                    extracted['season'] = words[0]
-                if words[1] in self.fashion_patterns['occasions']:
-                    extracted['occasion'] = words[1]
+        match = self._season_occasion_re.search(text)
+        if match:
+            extracted['raw_phrases'].append(_WS_RE.sub(' ', match.group(0).lower()))
+            extracted['season'] = match.group(1).lower()
+            # An occasion found earlier (e.g. "formal" in "formal dress for a winter wedding") stands
+            if not extracted.get('occasion'):
+                extracted['occasion'] = _WS_RE.sub(' ', match.group(2).lower())
         
         return extracted
     
@@ -235,6 +265,11 @@ class NLPAnalyzer:
         Returns:
             Dictionary containing extracted fashion attributes
         """
+        # Hand out a copy so callers can't mutate the cached analysis
+        return copy.deepcopy(self._analyze_cached(user_query))
+    
+    def _analyze_query(self, user_query: str) -> Dict[str, Any]:
+        """Run the full analysis for a query (memoized by analyze_query)."""
         # Clean the input text
         cleaned_text = self.clean_text(user_query)
         
@@ -270,63 +305,62 @@ class NLPAnalyzer:
     def _calculate_confidence(self, extracted: Dict[str, Any]) -> Dict[str, float]:
         """Calculate confidence scores for extracted attributes."""
         confidences: Dict[str, float] = {}
+        
+        if self.nlp is None:
+            # Values come straight from the pattern vocabularies, so treat them as exact matches
+            return {attr: 1.0 if extracted.get(attr) else 0.0 for attr in self._attr_map}
+        
+        # Embed all extracted values in one batch
+        values = [extracted.get(attr) for attr in self._attr_map if extracted.get(attr)]
+        value_docs = dict(zip(values, self.nlp.pipe(values)))
+        
         for attr, pattern_key in self._attr_map.items():
             value = extracted.get(attr)
             if not value:
                 confidences[attr] = 0.0
                 continue
 
-            # Embed the extracted value
-            value_doc = self.nlp(value)
+            value_doc = value_docs[value]
             if not value_doc.vector_norm:
                 # OOV or no vector — fall back to zero
                 confidences[attr] = 0.0
                 continue
 
-            # Compare against each candidate pattern
+            # Cosine similarity against every candidate pattern at once
+            pattern_vectors = self._pattern_vectors[pattern_key]
             best_sim = 0.0
-            for pat in self.fashion_patterns[pattern_key]:
-                pat_doc = self.nlp(pat)
-                if not pat_doc.vector_norm:
-                    continue
-                sim = value_doc.similarity(pat_doc)  # cosine under the hood
-                if sim > best_sim:
-                    best_sim = sim
+            if len(pattern_vectors):
+                best_sim = float((pattern_vectors @ value_doc.vector).max() / value_doc.vector_norm)
 
             # Clamp to [0,1]
             confidences[attr] = max(0.0, min(1.0, best_sim))
 
         return confidences
     
+    def release_model(self):
+        """Drop the spaCy model to free memory; analysis uses only the regex vocabularies until reload_model."""
+        self.nlp = None
+        _get_nlp.cache_clear()
+        self._analyze_cached.cache_clear()
+        gc.collect()
+    
+    def reload_model(self):
+        """Load the spaCy model again after release_model, restoring full analysis."""
+        if self.nlp is None:
+            self.nlp = _get_nlp()
+            self._analyze_cached.cache_clear()
+    
+    def _unit_vectors(self, texts: List[str]) -> np.ndarray:
+        """Stack normalized spaCy vectors for texts, skipping any without a vector."""
+        docs = self.nlp.pipe(texts, batch_size=128)
+        vectors = [doc.vector / doc.vector_norm for doc in docs if doc.vector_norm]
+        if not vectors:
+            return np.zeros((0, self.nlp.vocab.vectors_length), dtype=np.float32)
+        return np.stack(vectors)
+    
     def _extract_budget(self, text: str) -> Optional[float]:
         """Extract budget information from text using regex patterns."""
-        import re
-        
-        # Common budget patterns
-        budget_patterns = [
-            r'\$(\d+(?:\.\d{2})?)',  # $100, $99.99
-            r'(\d+(?:\.\d{2})?)\s*dollars?',  # 100 dollars, 100.50 dollar
-            r'under\s*\$?(\d+(?:\.\d{2})?)',  # under $100, under 100
-            r'below\s*\$?(\d+(?:\.\d{2})?)',  # below $100, below 100
-            r'less\s*than\s*\$?(\d+(?:\.\d{2})?)',  # less than $100, less than 100
-            r'budget\s*of\s*\$?(\d+(?:\.\d{2})?)',  # budget of $100, budget of 100
-            r'(\d+(?:\.\d{2})?)\s*dollar\s*budget',  # 100 dollar budget
-            r'around\s*\$?(\d+(?:\.\d{2})?)',  # around $100, around 100
-            r'up\s*to\s*\$?(\d+(?:\.\d{2})?)',  # up to $100, up to 100
-            r'max\s*\$?(\d+(?:\.\d{2})?)',  # max $100, max 100
-        ]
-        
-        text_lower = text.lower()
-        
-        for pattern in budget_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                try:
-                    return float(match.group(1))
-                except (ValueError, IndexError):
-                    continue
-        
-        return None
+        return extract_budget(text)
 
 # Example usage and testing
 if __name__ == "__main__":
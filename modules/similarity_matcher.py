@@ -7,27 +7,79 @@ using cosine similarity for semantic matching.
 
 import json
 import os
+import functools
+import hashlib
+import logging
+import pickle
 import spacy
+import scipy
+import sklearn
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional, Any
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+try:
+    from .vibe_mappings import load_json_file
+except ImportError:
+    # Imported as a top-level module with modules/ on sys.path
+    from vibe_mappings import load_json_file
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=None)
+def _get_nlp():
+    """Load the spaCy pipeline once per process."""
+    # Only the static word vectors are used, so no pipeline component is needed
+    return spacy.load("en_core_web_md", disable=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"])
+
+# Fitted vectors are cached here across processes, keyed by a hash of everything they depend on
+_VECTOR_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'vibefusion')
+# Bump when the cached tuple's layout changes
+_VECTOR_CACHE_VERSION = 1
+
+def _load_vector_cache(key: str) -> Optional[tuple]:
+    """Load previously fitted vibe vectors, or None if absent or unreadable."""
+    path = os.path.join(_VECTOR_CACHE_DIR, f"{key}.pkl")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # Corrupt or incompatible cache; rebuild from the JSON files
+        return None
+
+def _save_vector_cache(key: str, data: tuple):
+    """Persist fitted vibe vectors so later processes skip refitting."""
+    try:
+        os.makedirs(_VECTOR_CACHE_DIR, exist_ok=True)
+        path = os.path.join(_VECTOR_CACHE_DIR, f"{key}.pkl")
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning("could not write vibe vector cache: %s", e)
+
 class SimilarityMatcher:
-    def __init__(self, vibes_data_dir: str = "data/vibes/", similarity_threshold: float = 0.8):
+    def __init__(self, vibes_data_dir: str = "data/vibes/", similarity_threshold: float = 0.8, nlp=None):
         """
         Initialize the similarity matcher with JSON knowledge base.
         
         Args:
             vibes_data_dir: Directory containing vibe-to-attribute JSON files
             similarity_threshold: Minimum similarity score to accept a match
+            nlp: Already loaded spaCy pipeline to share (optional, loaded on demand otherwise)
         """
         self.vibes_data_dir = vibes_data_dir
         self.similarity_threshold = similarity_threshold
         
-        # Load spaCy model for semantic similarity
+        # Load spaCy model for semantic similarity; texts are only tokenized (make_doc),
+        # so a shared full pipeline costs no extra tagging or parsing here
         try:
-            self.nlp = spacy.load("en_core_web_md")
+            self.nlp = nlp if nlp is not None else _get_nlp()
         except OSError:
             print("Warning: spaCy model not available for similarity matching")
             self.nlp = None
@@ -39,9 +91,15 @@ class SimilarityMatcher:
         self.tfidf_vectorizer = TfidfVectorizer(
             lowercase=True,
             stop_words='english',
-            ngram_range=(1, 3)  # Include unigrams, bigrams, and trigrams
+            ngram_range=(1, 2),  # Include unigrams and bigrams
+            dtype=np.float32,
+            sublinear_tf=True,
+            norm='l2'  # Rows are unit length, so a dot product is the cosine similarity
         )
         
+        # Best match per phrase; phrases repeat across queries (e.g. "casual", "summer")
+        self._match_cached = functools.lru_cache(maxsize=1024)(self._match_phrase)
+        
         # Prepare all vibe keys for vectorization
         self._prepare_vibe_vectors()
     
@@ -54,29 +112,46 @@ class SimilarityMatcher:
             return mappings
         
         json_files = [f for f in os.listdir(self.vibes_data_dir) if f.endswith('.json')]
+        if not json_files:
+            return mappings
         
-        for json_file in json_files:
-            file_path = os.path.join(self.vibes_data_dir, json_file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    mapping_data = json.load(f)
+        # Read and parse the files concurrently (each parsed once per process while unchanged),
+        # then collect them in directory order
+        with ThreadPoolExecutor(max_workers=min(8, len(json_files))) as executor:
+            futures = [(json_file, executor.submit(load_json_file, os.path.join(self.vibes_data_dir, json_file)))
+                       for json_file in json_files]
+            
+            for json_file, future in futures:
+                try:
+                    mapping_data = future.result()
                     mapping_name = json_file.replace('.json', '')
                     mappings[mapping_name] = mapping_data
                     print(f"Loaded {len(mapping_data)} mappings from {json_file}")
-            except Exception as e:
-                print(f"Error loading {json_file}: {e}")
+                except Exception as e:
+                    print(f"Error loading {json_file}: {e}")
         
         return mappings
     
     def _prepare_vibe_vectors(self):
-        """Prepare TF-IDF vectors for all vibe keys."""
+        """Prepare TF-IDF vectors and spaCy word vectors for all vibe keys."""
+        self._match_cached.cache_clear()
         self.all_vibe_keys = []
         self.key_to_mapping = {}  # Maps vibe key to (mapping_type, attributes)
         
+        self._lower_key_to_vibe = {}  # Lowercased vibe key to the first vibe key spelled that way
+        
         for mapping_type, mapping_data in self.vibe_mappings.items():
             for vibe_key, attributes in mapping_data.items():
                 self.all_vibe_keys.append(vibe_key)
                 self.key_to_mapping[vibe_key] = (mapping_type, attributes)
+                self._lower_key_to_vibe.setdefault(vibe_key.lower(), vibe_key)
+        
+        # Reuse vectors fitted by an earlier process on the same mappings and model
+        cache_key = self._vector_cache_key()
+        cached = _load_vector_cache(cache_key) if self.all_vibe_keys else None
+        if cached is not None:
+            self.tfidf_vectorizer, self.tfidf_matrix, self._vibe_matrix, self._vibe_token_index = cached
+            return
         
         if self.all_vibe_keys:
             # Fit TF-IDF vectorizer on all vibe keys
@@ -88,6 +163,32 @@ class SimilarityMatcher:
         else:
             print("Warning: No vibe keys found for vectorization")
             self.tfidf_matrix = None
+        
+        # Parse every vibe key once, in batches, into a row-normalized (keys x dims) vector matrix
+        # so matching a phrase is one matrix-vector product
+        self._vibe_matrix = None
+        self._vibe_token_index = {}
+        if self.nlp and self.all_vibe_keys:
+            docs = list(self.nlp.tokenizer.pipe(self.all_vibe_keys, batch_size=128))
+            vectors = np.array([doc.vector for doc in docs], dtype=np.float32)
+            norms = np.array([doc.vector_norm for doc in docs], dtype=np.float32)
+            self._vibe_matrix = np.divide(vectors, norms[:, None], out=np.zeros_like(vectors), where=norms[:, None] > 0)
+            # spaCy scores token-identical docs as 1.0 even without vectors; keep the first key per token sequence
+            for i in reversed(range(len(docs))):
+                self._vibe_token_index[tuple(token.orth for token in docs[i])] = i
+        
+        if self.tfidf_matrix is not None:
+            _save_vector_cache(cache_key, (self.tfidf_vectorizer, self.tfidf_matrix, self._vibe_matrix, self._vibe_token_index))
+    
+    def _vector_cache_key(self) -> str:
+        """Hash the mappings, spaCy model, vectorizer settings and library versions the fitted vectors depend on."""
+        meta = getattr(self.nlp, 'meta', {}) if self.nlp else {}
+        model = f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}" if self.nlp else 'no-model'
+        params = sorted(self.tfidf_vectorizer.get_params().items())
+        # The vectorizer and matrices are pickled, so a library upgrade must not reuse them
+        libraries = [sklearn.__version__, scipy.__version__, np.__version__]
+        payload = json.dumps([_VECTOR_CACHE_VERSION, model, repr(params), libraries, self.vibe_mappings])
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
     
     def calculate_spacy_similarity(self, phrase1: str, phrase2: str) -> float:
         """Calculate semantic similarity using spaCy word vectors."""
@@ -95,8 +196,8 @@ class SimilarityMatcher:
             return 0.0
         
         try:
-            doc1 = self.nlp(phrase1)
-            doc2 = self.nlp(phrase2)
+            doc1 = self.nlp.make_doc(phrase1)
+            doc2 = self.nlp.make_doc(phrase2)
             
             # Use spaCy's built-in similarity (cosine similarity of averaged word vectors)
             similarity = doc1.similarity(doc2)
@@ -105,8 +206,8 @@ class SimilarityMatcher:
             print(f"Warning: spaCy similarity calculation failed: {e}")
             return 0.0
     
-    def calculate_tfidf_similarity(self, query_phrase: str) -> List[Tuple[str, float]]:
-        """Calculate TF-IDF cosine similarity with all vibe keys."""
+    def calculate_tfidf_similarity(self, query_phrase: str, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Calculate TF-IDF cosine similarity with all vibe keys (or just the top_k best)."""
         if self.tfidf_matrix is None or self.tfidf_matrix.shape[0] == 0:
             return []
         
@@ -114,16 +215,20 @@ class SimilarityMatcher:
             # Transform query phrase
             query_vector = self.tfidf_vectorizer.transform([query_phrase])
             
-            # Calculate cosine similarity with all vibe keys
-            similarities = cosine_similarity(query_vector, self.tfidf_matrix).flatten()
+            # Calculate cosine similarity with all vibe keys as one sparse matrix-vector product
+            similarities = (self.tfidf_matrix @ query_vector.T).toarray().ravel()
             
-            # Create list of (vibe_key, similarity_score) tuples
-            similarity_pairs = list(zip(self.all_vibe_keys, similarities))
+            # Keep only the top_k scores (ties included) before sorting, instead of sorting every key
+            candidates = np.arange(len(similarities))
+            if top_k is not None and top_k < len(similarities):
+                kth_best = np.partition(similarities, len(similarities) - top_k)[len(similarities) - top_k]
+                candidates = np.flatnonzero(similarities >= kth_best)
             
-            # Sort by similarity score (descending)
-            similarity_pairs.sort(key=lambda x: x[1], reverse=True)
+            # Sort by similarity score (descending), earlier keys first on ties
+            order = candidates[np.argsort(-similarities[candidates], kind='stable')][:top_k]
             
-            return similarity_pairs
+            # Create list of (vibe_key, similarity_score) tuples
+            return [(self.all_vibe_keys[i], float(similarities[i])) for i in order]
         except Exception as e:
             print(f"Warning: TF-IDF similarity calculation failed: {e}")
             return []
@@ -148,19 +253,16 @@ class SimilarityMatcher:
             'method_used': {}
         }
         
-        # Combine phrases and individual attributes for matching
-        all_candidates = extracted_phrases.copy()
-        
-        # Add individual attributes that were extracted (only strings)
-        for attr_type, attr_value in individual_attributes.items():
-            if attr_value and isinstance(attr_value, str):
-                all_candidates.append(attr_value)
+        # Combine phrases and individual attributes (only strings) for matching, dropping
+        # blanks and duplicates such as "casual" extracted both as a phrase and as a style
+        all_candidates = list(dict.fromkeys(
+            candidate
+            for candidate in [*extracted_phrases, *individual_attributes.values()]
+            if candidate and isinstance(candidate, str) and len(candidate.strip()) >= 2
+        ))
         
         # Try to match each candidate phrase/attribute
         for candidate in all_candidates:
-            if not candidate or len(candidate.strip()) < 2:
-                continue
-                
             best_match = self._find_best_match_for_phrase(candidate)
             
             if best_match:
@@ -203,28 +305,41 @@ class SimilarityMatcher:
         Returns:
             Tuple of (vibe_key, similarity_score, mapping_type, attributes) or None
         """
+        return self._match_cached(phrase)
+    
+    def _match_phrase(self, phrase: str) -> Optional[Tuple[str, float, str, Dict]]:
+        """Score a phrase against the vibe keys (memoized by _find_best_match_for_phrase)."""
         best_match = None
         best_score = 0.0
         
         # Method 1: Try exact or near-exact matches first
-        phrase_lower = phrase.lower().strip()
-        for vibe_key in self.all_vibe_keys:
-            if phrase_lower == vibe_key.lower():
-                mapping_type, attributes = self.key_to_mapping[vibe_key]
-                return (vibe_key, 1.0, mapping_type, attributes)
+        vibe_key = self._lower_key_to_vibe.get(phrase.lower().strip())
+        if vibe_key is not None:
+            mapping_type, attributes = self.key_to_mapping[vibe_key]
+            return (vibe_key, 1.0, mapping_type, attributes)
         
         # Method 2: Use spaCy similarity if available
-        if self.nlp:
-            for vibe_key in self.all_vibe_keys:
-                similarity = self.calculate_spacy_similarity(phrase, vibe_key)
-                if similarity > best_score:
-                    best_score = similarity
+        if self._vibe_matrix is not None:
+            phrase_doc = self.nlp.make_doc(phrase)
+            same_tokens = self._vibe_token_index.get(tuple(token.orth for token in phrase_doc))
+            if same_tokens is not None:
+                # spaCy scores token-identical docs as 1.0, which no other key can beat
+                vibe_key = self.all_vibe_keys[same_tokens]
+                mapping_type, attributes = self.key_to_mapping[vibe_key]
+                return (vibe_key, 1.0, mapping_type, attributes)
+            
+            if phrase_doc.vector_norm:
+                scores = self._vibe_matrix @ (phrase_doc.vector / phrase_doc.vector_norm)
+                best_index = int(scores.argmax())
+                if scores[best_index] > best_score:
+                    best_score = float(scores[best_index])
+                    vibe_key = self.all_vibe_keys[best_index]
                     mapping_type, attributes = self.key_to_mapping[vibe_key]
-                    best_match = (vibe_key, similarity, mapping_type, attributes)
+                    best_match = (vibe_key, best_score, mapping_type, attributes)
         
         # Method 3: Use TF-IDF similarity as backup
         if best_score < 0.5:  # Only use TF-IDF if spaCy didn't find good matches
-            tfidf_matches = self.calculate_tfidf_similarity(phrase)
+            tfidf_matches = self.calculate_tfidf_similarity(phrase, top_k=1)
             if tfidf_matches:
                 top_vibe_key, top_score = tfidf_matches[0]
                 if top_score > best_score:
@@ -233,6 +348,18 @@ class SimilarityMatcher:
         
         return best_match
     
+    def release_model(self):
+        """Drop the spaCy model and vibe vectors; matching falls back to exact and TF-IDF matches."""
+        self.nlp = None
+        self._vibe_matrix = None
+        self._vibe_token_index = {}
+        self._match_cached.cache_clear()
+    
+    def reload_model(self, nlp):
+        """Use a spaCy model again after release_model, rebuilding the vibe vectors."""
+        self.nlp = nlp
+        self._prepare_vibe_vectors()
+    
     def merge_attributes(self, *attribute_dicts: Dict[str, Any]) -> Dict[str, Any]:
         """
         Merge multiple attribute dictionaries, handling conflicts intelligently.
@@ -252,15 +379,21 @@ class SimilarityMatcher:
             for key, value in attr_dict.items():
                 if key not in merged:
                     merged[key] = value
-                elif merged[key] != value:
-                    # Handle conflicts - could be improved with domain knowledge
-                    if isinstance(value, list) and isinstance(merged[key], list):
-                        # Merge lists and remove duplicates
-                        merged[key] = list(set(merged[key] + value))
-                    elif isinstance(value, str) and isinstance(merged[key], str):
-                        # For strings, keep the more specific one (longer usually means more specific)
-                        if len(value) > len(merged[key]):
-                            merged[key] = value
+                    continue
+                
+                current = merged[key]
+                if current == value:
+                    continue
+                
+                # Handle conflicts - could be improved with domain knowledge
+                if isinstance(value, list):
+                    if isinstance(current, list):
+                        # Merge lists and remove duplicates, keeping first-seen order
+                        merged[key] = list(dict.fromkeys(current + value))
+                elif isinstance(value, str) and isinstance(current, str):
+                    # For strings, keep the more specific one (longer usually means more specific)
+                    if len(value) > len(current):
+                        merged[key] = value
         
         return merged
     
@@ -0,0 +1,45 @@
+"""
+Vibe Mapping File Access
+
+Reads the vibe-to-attribute JSON knowledge base files without pulling in the NLP stack,
+parsing each file at most once per process while it is unchanged.
+"""
+
+import json
+import os
+import functools
+from typing import Dict, Any
+
+try:
+    # orjson is a much faster JSON parser; optional, the stdlib json module works too
+    import orjson
+except ImportError:
+    orjson = None
+
+def read_json(path: str) -> Any:
+    """Read and parse a JSON file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson else json.loads(data)
+
+@functools.lru_cache(maxsize=None)
+def _read_json_cached(path: str, mtime: float) -> Any:
+    """Parse a file once per (path, modification time)."""
+    return read_json(path)
+
+def load_json_file(path: str) -> Any:
+    """
+    Parse a JSON file, reusing the previous parse while the file is unchanged.
+
+    The parsed value is shared between callers, so treat it as read-only.
+    """
+    path = os.path.abspath(path)
+    return _read_json_cached(path, os.path.getmtime(path))
+
+def load_mapping(name: str, vibes_data_dir: str = "data/vibes/") -> Dict[str, Any]:
+    """
+    Load <name>_mapping.json from the vibes directory, e.g. load_mapping('fit').
+
+    The parsed dict is shared between callers, so treat it as read-only.
+    """
+    return load_json_file(os.path.join(vibes_data_dir, f"{name}_mapping.json"))
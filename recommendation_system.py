@@ -6,17 +6,131 @@ from user queries to natural language suggestions.
 """
 
 import os
+import re
 import sys
-from typing import Dict, List, Optional, Any
+import gc
+import copy
+import json
+import hashlib
+import atexit
+import asyncio
+import logging
+import functools
+import itertools
+import threading
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, NamedTuple, Tuple
 
 # Add modules to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
 
-from modules.nlp_analyzer import NLPAnalyzer
-from modules.similarity_matcher import SimilarityMatcher
-from modules.gpt_inference import GPTInference
-from modules.catalog_filter import CatalogFilter
-from modules.nlg_generator import NLGGenerator
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r'\s+')
+
+_MODULE_NAMES = ('nlp_analyzer', 'similarity_matcher', 'gpt_inference', 'catalog_filter', 'nlg_generator')
+
+# Must have category, size, and budget; ordered so follow-up questions are stable
+_CRITICAL_ATTRIBUTES = ('category', 'size', 'budget')
+_CRITICAL_ATTRIBUTES_SET = frozenset(_CRITICAL_ATTRIBUTES)
+_CONTEXT_ATTRIBUTES = frozenset({'occasion', 'season', 'style', 'fit'})
+
+# Options offered in follow-up questions
+_AVAILABLE_CATEGORIES = ["dress", "top", "pants", "skirt", "jacket", "shirt", "blouse"]
+_AVAILABLE_OCCASIONS = ["casual", "formal", "work", "party", "date", "wedding", "brunch", "vacation"]
+_AVAILABLE_STYLES = ["casual", "formal", "chic", "bohemian", "minimalist", "edgy", "romantic", "professional"]
+_AVAILABLE_FITS = ["relaxed", "tailored", "loose", "fitted", "oversized", "slim", "regular"]
+_AVAILABLE_SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+
+_QUESTION_TEMPLATES = {
+    'category': f"What type of clothing are you looking for? Choose from: {', '.join(_AVAILABLE_CATEGORIES)}",
+    'size': f"What size do you need? Available sizes: {', '.join(_AVAILABLE_SIZES)}",
+    'budget': "What's your budget? You can say something like '$50', 'under $100', or '200 dollars'",
+    'occasion': f"What's the occasion? For example: {', '.join(_AVAILABLE_OCCASIONS[:6])}",
+    'season': "What season is this for? (spring, summer, fall, winter)",
+    'style': f"What style are you going for? Options include: {', '.join(_AVAILABLE_STYLES[:6])}",
+    'fit': f"How would you like it to fit? Choose from: {', '.join(_AVAILABLE_FITS[:4])}",
+    # Compound entry added by _check_missing_attributes when there is no context at all
+    'occasion or style': (
+        f"Tell me about the occasion or style! For example: "
+        f"{', '.join(_AVAILABLE_OCCASIONS[:4])} or {', '.join(_AVAILABLE_STYLES[:4])}"
+    )
+}
+
+_ATTRIBUTE_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'vibefusion', 'attributes')
+# Bump when the cached entry's layout changes
+_ATTRIBUTE_CACHE_VERSION = 2
+# Every distinct chat turn adds an entry, so the oldest are pruned beyond this many
+_ATTRIBUTE_CACHE_MAX_ENTRIES = 2000
+# Pruning lists the whole directory, so only do it every this many writes
+_ATTRIBUTE_CACHE_PRUNE_INTERVAL = 100
+_attribute_cache_writes = itertools.count(1)
+
+def _load_attribute_cache(key: str) -> Optional[list]:
+    """Load the stored analysis for a query, or None if absent or unreadable."""
+    path = os.path.join(_ATTRIBUTE_CACHE_DIR, f"{key}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        # Corrupt or incompatible entry; recompute it
+        return None
+
+def _save_attribute_cache(key: str, data: tuple):
+    """Persist a query's analysis so later runs skip NLP, matching and GPT."""
+    try:
+        os.makedirs(_ATTRIBUTE_CACHE_DIR, exist_ok=True)
+        path = os.path.join(_ATTRIBUTE_CACHE_DIR, f"{key}.json")
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        if next(_attribute_cache_writes) % _ATTRIBUTE_CACHE_PRUNE_INTERVAL == 0:
+            _prune_attribute_cache()
+    except Exception as e:
+        logger.warning("could not write attribute cache: %s", e)
+
+def _prune_attribute_cache():
+    """Delete the least recently written entries once the cache holds too many."""
+    with os.scandir(_ATTRIBUTE_CACHE_DIR) as entries:
+        files = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.name.endswith('.json')]
+    if len(files) <= _ATTRIBUTE_CACHE_MAX_ENTRIES:
+        return
+    files.sort()
+    for _, path in files[:len(files) - _ATTRIBUTE_CACHE_MAX_ENTRIES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Another process pruned it first
+            pass
+
+class RecommendationResult(NamedTuple):
+    """Outcome of get_recommendations; unsuccessful results carry a message and follow-up questions."""
+    success: bool
+    final_attributes: Dict[str, Any]
+    processing_details: Dict[str, Any]
+    recommendation: Optional[str] = None
+    products: Tuple[Dict[str, Any], ...] = ()
+    message: Optional[str] = None
+    missing_attributes: Tuple[str, ...] = ()
+    suggested_questions: Tuple[str, ...] = ()
+
+def _normalize_query(user_query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a cache entry."""
+    return _WS_RE.sub(' ', user_query.strip().lower())
+
+def _enable_verbose_logging():
+    """Send this module's progress trace to stderr (library use stays at WARNING)."""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
 
 class VibeRecommendationSystem:
     def __init__(self, config: Optional[Dict[str, Any]] = None):
@@ -27,24 +141,93 @@ class VibeRecommendationSystem:
             config: Configuration dictionary with system settings
         """
         self.config = config or {}
+        if self.config.get('verbose'):
+            _enable_verbose_logging()
+        
+        # Modules are imported and constructed lazily on first use; see warmup()
         
-        # Initialize all modules
-        self.nlp_analyzer = NLPAnalyzer()
-        self.similarity_matcher = SimilarityMatcher(
+        # NLP analysis + similarity matching depend only on the query and static vibe data
+        self._understand_cached = functools.lru_cache(maxsize=1024)(self._understand_query)
+        
+        self._spacy_released = False
+        if self.config.get('drop_spacy_after_embed'):
+            self.warmup().release_spacy_model()
+        
+        logger.info("✓ Vibe Recommendation System initialized successfully!")
+    
+    @functools.cached_property
+    def nlp_analyzer(self):
+        from modules.nlp_analyzer import NLPAnalyzer
+        return NLPAnalyzer()
+    
+    @functools.cached_property
+    def similarity_matcher(self):
+        from modules.similarity_matcher import SimilarityMatcher
+        # Share the analyzer's spaCy model rather than loading a second copy
+        return SimilarityMatcher(
             vibes_data_dir=self.config.get('vibes_data_dir', 'data/vibes/'),
-            similarity_threshold=self.config.get('similarity_threshold', 0.8)
+            similarity_threshold=self.config.get('similarity_threshold', 0.8),
+            nlp=self.nlp_analyzer.nlp
         )
-        self.gpt_inference = GPTInference()
-        self.catalog_filter = CatalogFilter(
+    
+    @functools.cached_property
+    def gpt_inference(self):
+        from modules.gpt_inference import GPTInference
+        return GPTInference()
+    
+    @functools.cached_property
+    def catalog_filter(self):
+        from modules.catalog_filter import CatalogFilter
+        return CatalogFilter(
             catalog_file=self.config.get('catalog_file', 'data/Apparels_shared.xlsx')
         )
-        self.nlg_generator = NLGGenerator()
+    
+    @functools.cached_property
+    def nlg_generator(self):
+        from modules.nlg_generator import NLGGenerator
+        return NLGGenerator()
+    
+    def warmup(self) -> 'VibeRecommendationSystem':
+        """Load every module now, in parallel, instead of on the first request."""
+        with ThreadPoolExecutor(max_workers=len(_MODULE_NAMES)) as executor:
+            nlp_future = executor.submit(getattr, self, 'nlp_analyzer')
+            futures = [nlp_future] + [
+                executor.submit(getattr, self, name)
+                for name in _MODULE_NAMES if name not in ('nlp_analyzer', 'similarity_matcher')
+            ]
+            # The matcher shares the analyzer's spaCy model, so build it once that is loaded
+            futures.append(executor.submit(lambda: (nlp_future.result(), self.similarity_matcher)))
+            for future in futures:
+                future.result()
+        return self
+    
+    def release_spacy_model(self):
+        """
+        Free the shared spaCy model to cut resident memory.
         
-        print("✓ Vibe Recommendation System initialized successfully!")
+        Later queries extract attributes with the regex vocabularies only (no noun chunks or
+        adjectives) and match vibes by exact key or TF-IDF instead of word vectors. The first
+        query that yields no attributes that way reloads the model (see reload_spacy_model).
+        """
+        self.nlp_analyzer.release_model()
+        self.similarity_matcher.release_model()
+        self._spacy_released = True
+        self._understand_cached.cache_clear()
+        # Cached attributes were computed with the model, so the fingerprint must change
+        self.__dict__.pop('_attribute_cache_fingerprint', None)
+        gc.collect()
+    
+    def reload_spacy_model(self):
+        """Load the shared spaCy model again after release_spacy_model."""
+        self.nlp_analyzer.reload_model()
+        self.similarity_matcher.reload_model(self.nlp_analyzer.nlp)
+        self._spacy_released = False
+        self._understand_cached.cache_clear()
+        self.__dict__.pop('_attribute_cache_fingerprint', None)
     
     def get_recommendations(self, 
                           user_query: str,
-                          user_preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                          user_preferences: Optional[Dict[str, Any]] = None) -> RecommendationResult:
         """
         Main method to get clothing recommendations from a user query.
         
@@ -53,36 +236,114 @@ class VibeRecommendationSystem:
             user_preferences: Additional user preferences (size, budget, etc.)
             
         Returns:
-            Dictionary containing recommendations and processing details
+            RecommendationResult with recommendations and processing details
         """
-        print(f"\n🔍 Processing query: '{user_query}'")
+        logger.info("\n🔍 Processing query: '%s'", user_query)
+        
+        # Steps 1-4 depend only on the query, knowledge base and models, so a stored result can be
+        # reused. Opt-in (config 'attribute_cache'): entries keep user queries on disk and pin GPT's answers
+        cache_key = self._attribute_cache_key(user_query, user_preferences) if self.config.get('attribute_cache', False) else None
+        cached = _load_attribute_cache(cache_key) if cache_key else None
+        if cached is not None:
+            nlp_result, similarity_result, gpt_attributes, final_attributes = cached
+            nlp_result['original_query'] = user_query
+            logger.info("✓ Using cached attributes: %s", final_attributes)
+        else:
+            nlp_result, similarity_result, gpt_attributes, final_attributes = self._infer_attributes(
+                user_query, user_preferences
+            )
+            # GPT returns None both when it isn't configured (part of the fingerprint, so safe
+            # to store) and when a configured call failed, which shouldn't be pinned
+            gpt_failed = gpt_attributes is None and self.gpt_inference.available
+            if cache_key and not gpt_failed:
+                _save_attribute_cache(cache_key, (nlp_result, similarity_result, gpt_attributes, final_attributes))
         
+        # Step 5: Check for missing critical attributes
+        missing_attributes = self._check_missing_attributes(final_attributes)
+        if missing_attributes:
+            logger.info("⚠ Missing critical attributes: %s", missing_attributes)
+            
+            # Generate user-friendly questions and use the first one as the main message
+            follow_up_questions = self._generate_follow_up_questions(missing_attributes)
+            user_friendly_message = follow_up_questions[0] if follow_up_questions else "I need more information to help you find the perfect clothing item."
+            
+            return RecommendationResult(
+                success=False,
+                message=user_friendly_message,
+                missing_attributes=tuple(missing_attributes),
+                suggested_questions=tuple(follow_up_questions),
+                final_attributes=final_attributes,
+                processing_details={
+                    'nlp_analysis': nlp_result,
+                    'similarity_matching': similarity_result
+                }
+            )
+        
+        # Step 6: Product Filtering
+        logger.info("\nStep 5: Filtering product catalog...")
+        matching_products = self.catalog_filter.filter_products(
+            attributes=final_attributes,
+            max_results=self.config.get('max_results', 5)
+        )
+        
+        logger.info("✓ Found %d matching products", len(matching_products))
+        
+        # Step 7: Natural Language Generation
+        logger.info("\nStep 6: Generating natural language response...")
+        suggestion = self.nlg_generator.generate_suggestion(
+            products=matching_products,
+            original_query=user_query,
+            attributes=final_attributes
+        )
+        
+        logger.info("✓ Generated recommendation response")
+        
+        return RecommendationResult(
+            success=True,
+            recommendation=suggestion,
+            products=tuple(matching_products),
+            final_attributes=final_attributes,
+            processing_details={
+                'nlp_analysis': nlp_result,
+                'similarity_matching': similarity_result,
+                'gpt_inference': gpt_attributes,
+                'products_found': len(matching_products)
+            }
+        )
+    
+    def _infer_attributes(self,
+                          user_query: str,
+                          user_preferences: Optional[Dict[str, Any]]) -> tuple:
+        """Steps 1-4: NLP analysis, vibe matching, GPT inference and attribute merging."""
         # Step 1: NLP Analysis
-        print("Step 1: Analyzing natural language query...")
-        nlp_result = self.nlp_analyzer.analyze_query(user_query)
+        logger.info("Step 1: Analyzing natural language query...")
+        nlp_result, similarity_result = copy.deepcopy(
+            self._understand_cached(_normalize_query(user_query))
+        )
+        nlp_result['original_query'] = user_query
         extracted_attributes = nlp_result['extracted_attributes']
         key_phrases = nlp_result['key_phrases']
         
-        print(f"✓ Extracted attributes: {extracted_attributes}")
-        print(f"✓ Key phrases: {key_phrases}")
+        logger.info("✓ Extracted attributes: %s", extracted_attributes)
+        logger.info("✓ Key phrases: %s", key_phrases)
         
         # Step 2: Similarity Matching
-        print("\nStep 2: Matching against vibe knowledge base...")
-        similarity_result = self.similarity_matcher.find_best_matches(
-            extracted_phrases=key_phrases,
-            individual_attributes=extracted_attributes
-        )
-        
+        logger.info("\nStep 2: Matching against vibe knowledge base...")
         rule_based_attributes = similarity_result['matched_attributes']
         has_high_confidence = similarity_result['has_high_confidence_matches']
         
-        print(f"✓ Rule-based matches: {rule_based_attributes}")
-        print(f"✓ High confidence matches: {has_high_confidence}")
+        logger.info("✓ Rule-based matches: %s", rule_based_attributes)
+        logger.info("✓ High confidence matches: %s", has_high_confidence)
         
         # Step 3: GPT Inference (if needed)
         gpt_attributes = {}
-        if not has_high_confidence or len(rule_based_attributes) < 3:
-            print("\nStep 3: Using GPT for attribute inference...")
+        # GPT ranks below user preferences and rule-based matches, so a category fixed by
+        # either can't change; if the catalog has nothing in it, skip the round-trip
+        settled_category = (user_preferences or {}).get('category') or rule_based_attributes.get('category')
+        if settled_category and self.catalog_filter.count_matches({'category': settled_category}) == 0:
+            logger.info("\nStep 3: Skipping GPT inference (no products in category '%s')", settled_category)
+        elif not has_high_confidence or len(rule_based_attributes) < 3:
+            logger.info("\nStep 3: Using GPT for attribute inference...")
             gpt_attributes = self.gpt_inference.infer_attributes(
                 user_query=user_query,
                 existing_attributes={**extracted_attributes, **rule_based_attributes},
@@ -90,14 +351,14 @@ class VibeRecommendationSystem:
             )
             
             if gpt_attributes:
-                print(f"✓ GPT inferred attributes: {gpt_attributes}")
+                logger.info("✓ GPT inferred attributes: %s", gpt_attributes)
             else:
-                print("⚠ GPT inference not available or failed")
+                logger.info("⚠ GPT inference not available or failed")
         else:
-            print("\nStep 3: Skipping GPT inference (high confidence rule-based matches)")
+            logger.info("\nStep 3: Skipping GPT inference (high confidence rule-based matches)")
         
         # Step 4: Merge attributes
-        print("\nStep 4: Merging attributes...")
+        logger.info("\nStep 4: Merging attributes...")
         final_attributes = self._merge_all_attributes(
             extracted_attributes,
             rule_based_attributes,
@@ -105,63 +366,89 @@ class VibeRecommendationSystem:
             user_preferences or {}
         )
         
-        print(f"✓ Final attributes: {final_attributes}")
+        logger.info("✓ Final attributes: %s", final_attributes)
         
-        # Step 5: Check for missing critical attributes
-        missing_attributes = self._check_missing_attributes(final_attributes)
-        if missing_attributes:
-            print(f"⚠ Missing critical attributes: {missing_attributes}")
-            
-            # Generate user-friendly questions and use the first one as the main message
-            follow_up_questions = self._generate_follow_up_questions(missing_attributes)
-            user_friendly_message = follow_up_questions[0] if follow_up_questions else "I need more information to help you find the perfect clothing item."
-            
-            return {
-                'success': False,
-                'message': user_friendly_message,
-                'missing_attributes': missing_attributes,
-                'suggested_questions': follow_up_questions,
-                'final_attributes': final_attributes,
-                'processing_details': {
-                    'nlp_analysis': nlp_result,
-                    'similarity_matching': similarity_result
-                }
-            }
-        
-        # Step 6: Product Filtering
-        print("\nStep 5: Filtering product catalog...")
-        matching_products = self.catalog_filter.filter_products(
-            attributes=final_attributes,
-            max_results=self.config.get('max_results', 5)
-        )
-        
-        print(f"✓ Found {len(matching_products)} matching products")
-        
-        # Step 7: Natural Language Generation
-        print("\nStep 6: Generating natural language response...")
-        suggestion = self.nlg_generator.generate_suggestion(
-            products=matching_products,
-            original_query=user_query,
-            attributes=final_attributes
+        return nlp_result, similarity_result, gpt_attributes, final_attributes
+    
+    def _attribute_cache_key(self, user_query: str, user_preferences: Optional[Dict[str, Any]]) -> str:
+        """Hash the normalized query and preferences together with everything steps 1-4 depend on."""
+        payload = json.dumps([self._attribute_cache_fingerprint, _normalize_query(user_query), user_preferences or {}],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @functools.cached_property
+    def _attribute_cache_fingerprint(self) -> str:
+        """Fingerprint of the knowledge base, catalog, spaCy model, threshold and GPT model."""
+        meta = getattr(self.nlp_analyzer.nlp, 'meta', {})
+        # GPT may be skipped based on catalog contents, so a rewritten catalog invalidates entries
+        catalog_file = self.catalog_filter.catalog_file
+        catalog_mtime = os.path.getmtime(catalog_file) if os.path.exists(catalog_file) else None
+        payload = json.dumps([
+            _ATTRIBUTE_CACHE_VERSION,
+            f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}",
+            catalog_file,
+            catalog_mtime,
+            self.similarity_matcher.similarity_threshold,
+            self.gpt_inference.MODEL if self.gpt_inference.available else None,
+            self.similarity_matcher.vibe_mappings
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _understand_query(self, normalized_query: str):
+        """Run NLP analysis and similarity matching for a normalized query."""
+        nlp_result = self.nlp_analyzer.analyze_query(normalized_query)
+        if self._spacy_released and not any(nlp_result['extracted_attributes'].values()):
+            # The regex vocabularies found nothing, so bring the model back for this and later queries
+            logger.info("↻ Reloading spaCy model for a query the vocabularies couldn't parse")
+            self.reload_spacy_model()
+            nlp_result = self.nlp_analyzer.analyze_query(normalized_query)
+        similarity_result = self.similarity_matcher.find_best_matches(
+            extracted_phrases=nlp_result['key_phrases'],
+            individual_attributes=nlp_result['extracted_attributes']
         )
+        return nlp_result, similarity_result
+    
+    def get_recommendations_batch(self,
+                                  queries: List[str],
+                                  user_preferences: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Get recommendations for several queries concurrently.
         
-        # Use the suggestion as-is (NLGGenerator already handles tone internally)
-        final_suggestion = suggestion
-        
-        print("✓ Generated recommendation response")
+        Queries run on a thread pool (config 'max_concurrency', default 4) so GPT round-trips
+        overlap. Results come back in query order; a query that raised yields its exception.
+        """
+        def run(query):
+            try:
+                return self.get_recommendations(query, user_preferences)
+            except Exception as e:
+                return e
         
-        return {
-            'success': True,
-            'recommendation': final_suggestion,
-            'products': matching_products,
-            'final_attributes': final_attributes,
-            'processing_details': {
-                'nlp_analysis': nlp_result,
-                'similarity_matching': similarity_result,
-                'gpt_inference': gpt_attributes,
-                'products_found': len(matching_products)
-            }
-        }
+        # Build the lazy modules up front; racing workers could otherwise each build them
+        self.warmup()
+        with ThreadPoolExecutor(max_workers=self.config.get('max_concurrency', 4)) as executor:
+            return list(executor.map(run, queries))
+    
+    async def get_recommendations_async(self,
+                                        user_query: str,
+                                        user_preferences: Optional[Dict[str, Any]] = None) -> RecommendationResult:
+        """Async variant of get_recommendations; the pipeline runs in a worker thread."""
+        # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_recommendations, user_query, user_preferences)
+    
+    async def get_recommendations_batch_async(self,
+                                              queries: List[str],
+                                              user_preferences: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Async variant of get_recommendations_batch, for callers already running an event loop."""
+        # Build the lazy modules up front; racing workers could otherwise each build them
+        await asyncio.get_running_loop().run_in_executor(None, self.warmup)
+        semaphore = asyncio.Semaphore(self.config.get('max_concurrency', 4))
+        
+        async def run(query):
+            async with semaphore:
+                return await self.get_recommendations_async(query, user_preferences)
+        
+        return await asyncio.gather(*(run(query) for query in queries), return_exceptions=True)
     
     def _merge_all_attributes(self, 
                             extracted: Dict[str, Any],
@@ -170,88 +457,33 @@ class VibeRecommendationSystem:
                             user_prefs: Dict[str, Any]) -> Dict[str, Any]:
         """Merge attributes from all sources with proper priority."""
         
-        # Priority order: user_prefs > rule_based > gpt_inferred > extracted
-        merged = {}
-        
-        # Start with extracted (lowest priority)
-        for key, value in extracted.items():
-            if value:
-                merged[key] = value
-        
-        # Override with GPT inferred (handle None case)
-        if gpt_inferred:
-            for key, value in gpt_inferred.items():
-                if value:
-                    merged[key] = value
-        
-        # Override with rule-based (higher confidence)
-        for key, value in rule_based.items():
-            if value:
-                merged[key] = value
-        
-        # Override with user preferences (highest priority)
-        for key, value in user_prefs.items():
-            if value:
-                merged[key] = value
+        # Priority order: user_prefs > rule_based > gpt_inferred > extracted.
+        # Empty values are dropped per source so they never shadow a lower-priority value.
+        layers = (user_prefs, rule_based, gpt_inferred or {}, extracted)
+        merged = dict(ChainMap(*({k: v for k, v in layer.items() if v} for layer in layers)))
         
         return merged
     
     def _check_missing_attributes(self, attributes: Dict[str, Any]) -> List[str]:
         """Check for missing critical attributes."""
-        critical_attributes = ['category', 'size', 'budget']  # Must have category, size, and budget
-        recommended_attributes = ['occasion', 'season']  # Good to have
-        
-        missing = []
+        # One pass over the attributes; everything else is set operations
+        present = {attr for attr, value in attributes.items() if value}
+        missing = [attr for attr in _CRITICAL_ATTRIBUTES if attr not in present]
         
-        # Check critical attributes
-        for attr in critical_attributes:
-            value = attributes.get(attr)
-            is_missing = attr not in attributes or not value
-            print(f"✓ Checking {attr}: value={repr(value)}, type={type(value)}, is_missing={is_missing}")
-            if is_missing:
-                missing.append(attr)
+        if logger.isEnabledFor(logging.DEBUG):
+            for attr in _CRITICAL_ATTRIBUTES:
+                value = attributes.get(attr)
+                logger.debug("✓ Checking %s: value=%r, type=%s, is_missing=%s", attr, value, type(value), attr not in present)
         
         # Check if we have at least some context (only if we have category, size, and budget)
-        if 'category' in attributes and 'size' in attributes and 'budget' in attributes:
-            context_attributes = ['occasion', 'season', 'style', 'fit']
-            has_context = any(attr in attributes and attributes[attr] for attr in context_attributes)
-            
-            if not has_context:
-                missing.extend(['occasion or style'])
+        if _CRITICAL_ATTRIBUTES_SET <= attributes.keys() and not present & _CONTEXT_ATTRIBUTES:
+            missing.append('occasion or style')
         
         return missing
     
     def _generate_follow_up_questions(self, missing_attributes: List[str]) -> List[str]:
         """Generate follow-up questions for missing attributes with helpful examples."""
-        questions = []
-        
-        # Get available options from the system
-        available_categories = ["dress", "top", "pants", "skirt", "jacket", "shirt", "blouse"]
-        available_occasions = ["casual", "formal", "work", "party", "date", "wedding", "brunch", "vacation"]
-        available_styles = ["casual", "formal", "chic", "bohemian", "minimalist", "edgy", "romantic", "professional"]
-        available_fits = ["relaxed", "tailored", "loose", "fitted", "oversized", "slim", "regular"]
-        available_sizes = ["XS", "S", "M", "L", "XL", "XXL"]
-        
-        question_templates = {
-            'category': f"What type of clothing are you looking for? Choose from: {', '.join(available_categories)}",
-            'size': f"What size do you need? Available sizes: {', '.join(available_sizes)}",
-            'budget': "What's your budget? You can say something like '$50', 'under $100', or '200 dollars'",
-            'occasion': f"What's the occasion? For example: {', '.join(available_occasions[:6])}",
-            'season': "What season is this for? (spring, summer, fall, winter)",
-            'style': f"What style are you going for? Options include: {', '.join(available_styles[:6])}",
-            'fit': f"How would you like it to fit? Choose from: {', '.join(available_fits[:4])}"
-        }
-        
-        for attr in missing_attributes:
-            if attr in question_templates:
-                questions.append(question_templates[attr])
-            elif 'or' in attr:  # Handle compound attributes like "occasion or style"
-                if 'occasion' in attr:
-                    questions.append(f"Tell me about the occasion or style! For example: {', '.join(available_occasions[:4])} or {', '.join(available_styles[:4])}")
-                else:
-                    questions.append(f"Could you tell me more about the {attr}? Give me some details!")
-        
-        return questions
+        return [_QUESTION_TEMPLATES[attr] for attr in missing_attributes if attr in _QUESTION_TEMPLATES]
     
     def get_system_status(self) -> Dict[str, Any]:
         """Get status of all system components."""
@@ -267,6 +499,8 @@ class VibeRecommendationSystem:
     
     def interactive_session(self):
         """Run an interactive recommendation session."""
+        _enable_input_history()
+        
         print("🌟 Welcome to the Vibe-to-Attribute Clothing Recommendation System!")
         print("Ask me for clothing recommendations using natural language.")
         print("Type 'quit' to exit, 'status' to see system status.\n")
@@ -275,32 +509,26 @@ class VibeRecommendationSystem:
             try:
                 user_input = input("👤 What are you looking for? ").strip()
                 
-                if user_input.lower() in ['quit', 'exit', 'bye']:
-                    print("👋 Thanks for using the recommendation system! Goodbye!")
-                    break
-                
-                if user_input.lower() == 'status':
-                    status = self.get_system_status()
-                    print("\n📊 System Status:")
-                    for component, status_msg in status.items():
-                        print(f"  • {component}: {status_msg}")
-                    print()
-                    continue
-                
                 if not user_input:
                     print("Please enter a clothing request or type 'quit' to exit.\n")
                     continue
                 
+                command = _SESSION_COMMANDS.get(user_input.lower())
+                if command:
+                    if command(self):
+                        break
+                    continue
+                
                 # Get recommendations
                 result = self.get_recommendations(user_input)
                 
-                if result['success']:
-                    print(f"\n🤖 {result['recommendation']}\n")
+                if result.success:
+                    print(f"\n🤖 {result.recommendation}\n")
                 else:
-                    print(f"\n🤖 {result['message']}")
-                    if 'suggested_questions' in result:
+                    print(f"\n🤖 {result.message}")
+                    if result.suggested_questions:
                         print("\nTo help me better, please answer:")
-                        for question in result['suggested_questions']:
+                        for question in result.suggested_questions:
                             print(f"  • {question}")
                     print()
                 
@@ -311,10 +539,46 @@ class VibeRecommendationSystem:
                 print(f"❌ An error occurred: {e}")
                 print("Please try again with a different request.\n")
 
+def _quit_command(system: VibeRecommendationSystem) -> bool:
+    print("👋 Thanks for using the recommendation system! Goodbye!")
+    return True
+
+def _status_command(system: VibeRecommendationSystem) -> bool:
+    status = system.get_system_status()
+    print("\n📊 System Status:")
+    for component, status_msg in status.items():
+        print(f"  • {component}: {status_msg}")
+    print()
+    return False
+
+# Interactive session commands; a handler returns True to end the session
+_SESSION_COMMANDS = {
+    'quit': _quit_command,
+    'exit': _quit_command,
+    'bye': _quit_command,
+    'status': _status_command,
+}
+
+def _enable_input_history():
+    """Keep interactive query history across sessions where readline is available."""
+    try:
+        import readline
+    except ImportError:
+        return
+    
+    history_file = os.path.expanduser('~/.vibefusion_history')
+    try:
+        readline.read_history_file(history_file)
+    except OSError:
+        pass
+    atexit.register(readline.write_history_file, history_file)
+
 # Example usage and testing
 if __name__ == "__main__":
+    BANNER = "=" * 50
+    
     # Initialize system
-    system = VibeRecommendationSystem()
+    system = VibeRecommendationSystem({'verbose': True})
     
     # Check system status
     print("System Status:")
@@ -329,21 +593,21 @@ if __name__ == "__main__":
         "Comfortable workout clothes for the gym"
     ]
     
-    print("\n" + "="*50)
+    print("\n" + BANNER)
     print("Testing with sample queries:")
-    print("="*50)
+    print(BANNER)
     
     for query in test_queries:
         print(f"\n🧪 Testing: '{query}'")
         result = system.get_recommendations(query)
         
-        if result['success']:
-            print(f"✅ Success: {result['recommendation']}")
+        if result.success:
+            print(f"✅ Success: {result.recommendation}")
         else:
-            print(f"❌ Failed: {result['message']}")
+            print(f"❌ Failed: {result.message}")
     
     # Start interactive session if run directly
-    print("\n" + "="*50)
+    print("\n" + BANNER)
     print("Starting interactive session...")
-    print("="*50)
+    print(BANNER)
     system.interactive_session() 
\ No newline at end of file
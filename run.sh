@@ -39,9 +39,24 @@ PYCODE
   return 0
 }
 
+requirements_present() {
+  # Every requirement (including the spaCy model wheel) is importable; versions aren't checked
+  python3 - <<'PYCODE'
+import importlib.util, sys
+modules = ["streamlit", "spacy", "pandas", "numpy", "sklearn", "openai", "httpx", "dotenv",
+           "openpyxl", "sentence_transformers", "setuptools", "en_core_web_md"]
+sys.exit(0 if all(importlib.util.find_spec(m) for m in modules) else 1)
+PYCODE
+}
+
 install_requirements() {
   echo -e "\n📦 Installing required packages..."
-  if python3 -m pip install -r requirements.txt; then
+  if requirements_present; then
+    echo "✅ Requirements already installed, skipping pip"
+    return 0
+  fi
+  # The spaCy model is a wheel URL in requirements.txt, so one pip run covers everything
+  if PIP_DISABLE_PIP_VERSION_CHECK=1 python3 -m pip install --no-input -r requirements.txt; then
     echo "✅ Requirements installed successfully!"
   else
     echo "❌ Failed to install requirements, continuing with existing packages..."
@@ -3,16 +3,22 @@ Streamlit Web Application for Vibe-to-Attribute Clothing Recommendation System
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import sys
 import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, Any, List
 
 
-try:
-    from recommendation_system import VibeRecommendationSystem
-except ImportError as e:
-    st.error(f"Failed to import recommendation system: {e}")
-    st.stop()
+logger = logging.getLogger(__name__)
+if os.getenv('STREAMLIT_DEBUG') == '1' and not logger.handlers:
+    # Per-attribute debug output, only wanted while developing
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.DEBUG)
 
 # Configure Streamlit page
 st.set_page_config(
@@ -50,15 +56,66 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state for conversation
-if 'recommendation_system' not in st.session_state:
-    with st.spinner("🔄 Initializing Fashion Recommendation System..."):
-        try:
-            st.session_state.recommendation_system = VibeRecommendationSystem()
-            st.session_state.system_initialized = True
-        except Exception as e:
-            st.session_state.system_initialized = False
-            st.error(f"Failed to initialize system: {e}")
+# Exchanges rendered on every rerun; older ones are behind a toggle
+CHAT_HISTORY_WINDOW = 20
+
+@st.cache_resource(show_spinner="🔄 Initializing Fashion Recommendation System...")
+def get_recsys():
+    """The recommendation system, built once per server and shared by every session."""
+    # Imported here so the page can render before the recommendation stack loads
+    from recommendation_system import VibeRecommendationSystem
+    return VibeRecommendationSystem().warmup()
+
+@st.cache_data(max_entries=2048, ttl=3600, show_spinner=False)
+def cached_analyze(text: str) -> Dict[str, Any]:
+    """NLP analysis of a normalized message, shared across sessions and turns."""
+    return get_recsys().nlp_analyzer.analyze_query(text)
+
+@st.cache_data(max_entries=512, ttl=3600, show_spinner=False)
+def cached_recommendations(user_query: str, user_preferences: tuple):
+    """Recommendations for a query and (sorted) preference items, shared across sessions."""
+    return get_recsys().get_recommendations(
+        user_query=user_query,
+        user_preferences=dict(user_preferences)
+    )
+
+@st.cache_data(ttl=30, show_spinner=False)
+def cached_system_status() -> Dict[str, str]:
+    """System status, reused for 30 seconds so repeated clicks don't re-probe every component."""
+    return get_recsys().get_system_status()
+
+@st.cache_resource
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    """Small pool for work that can overlap the main recommendation pipeline."""
+    return ThreadPoolExecutor(max_workers=2)
+
+def prefetch_analysis(text: str) -> Future:
+    """Start cached_analyze for text in the background, attached to the current script run."""
+    ctx = get_script_run_ctx()
+    
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return cached_analyze(normalize_text(text))
+    
+    return get_prefetch_executor().submit(run)
+
+def rerun_chat():
+    """Rerun only the chat fragment, or the whole app when this run isn't a fragment rerun."""
+    try:
+        st.rerun(scope="fragment")
+    except st.errors.StreamlitAPIException:
+        st.rerun()
+
+def describe_attributes(attributes: Dict[str, Any]) -> str:
+    """Render attributes as 'key: value; key: a, b' for a query string."""
+    return '; '.join(
+        f"{key}: {', '.join(map(str, value)) if isinstance(value, list) else value}"
+        for key, value in attributes.items()
+    )
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so equivalent messages share cache entries."""
+    return ' '.join(text.lower().split())
 
 # Initialize conversation state
 if 'conversation_history' not in st.session_state:
@@ -77,6 +134,15 @@ def main():
     st.markdown('<h1 class="main-header">�� Vibe Fashion Recommender</h1>', unsafe_allow_html=True)
     st.markdown('<p class="subtitle">Transform your style ideas into perfect outfit recommendations using AI</p>', unsafe_allow_html=True)
     
+    # Initialize the shared system once the header is on screen (failures aren't cached, so a refresh retries)
+    if not st.session_state.get('system_initialized', False):
+        try:
+            get_recsys()
+            st.session_state.system_initialized = True
+        except Exception as e:
+            st.session_state.system_initialized = False
+            st.error(f"Failed to initialize system: {e}")
+    
     # Check if system is initialized
     if not st.session_state.get('system_initialized', False):
         st.error("❌ System failed to initialize. Please refresh the page.")
@@ -86,7 +152,7 @@ def main():
     with st.sidebar:
         st.header("📊 System Status")
         if st.button("Check Status"):
-            status = st.session_state.recommendation_system.get_system_status()
+            status = cached_system_status()
             for component, status_msg in status.items():
                 if "Ready" in status_msg or "Loaded" in status_msg:
                     st.success(f"✅ {component}: {status_msg}")
@@ -97,24 +163,27 @@ def main():
         st.markdown("**💡 Tip:** Tell me your size and budget in the conversation!")
         st.markdown("*Example: 'I need a size M dress under $100 for a party'*")
     
+    chat_panel()
 
+@st.fragment
+def chat_panel():
+    """Chat history, input and actions; interactions here rerun only this fragment."""
     
     # Chat interface for conversation
     st.header("💬 Fashion Chat")
     
-    # Display conversation history
-    if st.session_state.conversation_history:
+    # Display conversation history: the latest exchanges always, older ones only on request
+    history = st.session_state.conversation_history
+    if history:
         st.markdown("**Conversation History:**")
-        chat_container = st.container()
-        with chat_container:
-            for i, exchange in enumerate(st.session_state.conversation_history):
-                # User message
-                st.markdown(f"**You:** {exchange['user']}")
-                # Assistant response
-                if exchange.get('assistant'):
-                    st.markdown(f"**Assistant:** {exchange['assistant']}")
-                if i < len(st.session_state.conversation_history) - 1:
-                    st.markdown("---")
+        older, recent = history[:-CHAT_HISTORY_WINDOW], history[-CHAT_HISTORY_WINDOW:]
+        if older:
+            # A fixed label and key keep the toggle's state as the history grows
+            show_older = st.toggle("Show full history", key="show_full_history")
+            st.caption(f"{len(older)} earlier exchanges")
+            if show_older:
+                render_exchanges(older)
+        render_exchanges(recent)
     
     # Current pending context
     if st.session_state.pending_attributes:
@@ -139,7 +208,7 @@ def main():
             st.session_state.pending_attributes = {}
             st.session_state.missing_attributes = []
             st.session_state.conversation_active = False
-            st.rerun()
+            rerun_chat()
     
     with col2:
         if st.button("✨ Get Final Recommendations"):
@@ -152,42 +221,49 @@ def main():
     if send_button and user_input.strip():
         process_user_input(user_input, {})
 
+def render_exchanges(exchanges: List[Dict[str, str]]):
+    """Render user/assistant exchanges as chat messages."""
+    for exchange in exchanges:
+        with st.chat_message("user"):
+            st.markdown(exchange['user'])
+        if exchange.get('assistant'):
+            with st.chat_message("assistant"):
+                st.markdown(exchange['assistant'])
+
 def process_user_input(user_input: str, user_prefs: Dict[str, Any]):
     """Process user input in conversational context."""
     
     # Combine current input with pending attributes to form complete query
     if st.session_state.pending_attributes:
-        # Build context from previous conversation
-        context_parts = []
-        for key, value in st.session_state.pending_attributes.items():
-            if isinstance(value, list):
-                context_parts.append(f"{key}: {', '.join(value)}")
-            else:
-                context_parts.append(f"{key}: {value}")
-        
-        # Combine context with new input
-        combined_query = f"Previous context: {'; '.join(context_parts)}. New information: {user_input}"
+        # Combine context from previous conversation with new input
+        combined_query = f"Previous context: {describe_attributes(st.session_state.pending_attributes)}. New information: {user_input}"
+        # The message's own analysis is only read on follow-ups, but it doesn't depend on the
+        # pipeline result, so run it alongside instead of after
+        analysis_future = prefetch_analysis(user_input)
     else:
         combined_query = user_input
+        # The pipeline analyzes exactly this message, so its analysis is reused below
+        analysis_future = None
     
     with st.spinner("🤖 Processing your message..."):
         try:
             # Get recommendations with combined context and pending attributes
             # Pass pending attributes as user preferences (highest priority)
-            merged_prefs = user_prefs.copy()
-            merged_prefs.update(st.session_state.pending_attributes)
+            # Only read below, so use pending attributes as-is when there is nothing to merge
+            pending = st.session_state.pending_attributes
+            merged_prefs = {**user_prefs, **pending} if user_prefs else pending
             
-            result = st.session_state.recommendation_system.get_recommendations(
-                user_query=combined_query,
-                user_preferences=merged_prefs
+            result = cached_recommendations(
+                combined_query,
+                tuple(sorted(merged_prefs.items()))
             )
             
             # Add to conversation history
             exchange = {"user": user_input}
             
-            if result['success']:
+            if result.success:
                 # Got successful recommendations
-                exchange["assistant"] = result['recommendation']
+                exchange["assistant"] = result.recommendation
                 st.session_state.conversation_history.append(exchange)
                 st.session_state.conversation_active = False
                 st.session_state.pending_attributes = {}
@@ -198,42 +274,44 @@ def process_user_input(user_input: str, user_prefs: Dict[str, Any]):
                 
             else:
                 # Need more information - maintain conversation state
-                exchange["assistant"] = result['message']
+                exchange["assistant"] = result.message
                 st.session_state.conversation_history.append(exchange)
                 st.session_state.conversation_active = True
-                st.session_state.missing_attributes = result.get('missing_attributes', [])
+                st.session_state.missing_attributes = list(result.missing_attributes)
                 
                 # Update pending attributes with what we know so far
-                if 'final_attributes' in result:
-                    st.session_state.pending_attributes.update(result['final_attributes'])
+                st.session_state.pending_attributes.update(result.final_attributes)
                 
                 # Extract new attributes from current input only (not combined query)
                 try:
                     # Analyze just the current user input to extract new attributes
-                    nlp_result = st.session_state.recommendation_system.nlp_analyzer.analyze_query(user_input)
+                    if analysis_future is not None:
+                        nlp_result = analysis_future.result()
+                    else:
+                        nlp_result = result.processing_details.get('nlp_analysis')
                     if nlp_result and 'extracted_attributes' in nlp_result:
-                        extracted = nlp_result['extracted_attributes']
-                        for key, value in extracted.items():
-                            if value and value not in [None, "", []]:
-                                st.session_state.pending_attributes[key] = value
-                                print(f"✓ Updated pending attributes from current input: {key} = {value}")
-                                # Show debug info for size and budget specifically
-                                if key in ['size', 'budget']:
-                                    print(f"  {key.title()} type: {type(value)}, value: {repr(value)}")
+                        # Truthiness already rules out None, "" and []
+                        updates = {key: value for key, value in nlp_result['extracted_attributes'].items() if value}
+                        st.session_state.pending_attributes.update(updates)
+                        for key, value in updates.items():
+                            logger.debug("✓ Updated pending attributes from current input: %s = %s", key, value)
+                            # Show debug info for size and budget specifically
+                            if key in ['size', 'budget']:
+                                logger.debug("  %s type: %s, value: %r", key.title(), type(value), value)
                 except Exception as e:
-                    print(f"Error extracting attributes from current input: {e}")
+                    logger.warning("Error extracting attributes from current input: %s", e)
                     pass
                 
                 # Show the assistant's response
                 st.info(f"💬 **Assistant:** {exchange['assistant']}")
                 
                 # Show follow-up questions
-                if 'suggested_questions' in result:
+                if result.suggested_questions:
                     st.markdown("**To help me better, please answer:**")
-                    for question in result['suggested_questions']:
+                    for question in result.suggested_questions:
                         st.write(f"• {question}")
                 
-                st.rerun()
+                rerun_chat()
                 
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
@@ -242,23 +320,16 @@ def get_final_recommendations(pending_attributes: Dict[str, Any], user_prefs: Di
     """Get final recommendations with accumulated attributes."""
     
     # Build a query from accumulated attributes
-    query_parts = []
-    for key, value in pending_attributes.items():
-        if isinstance(value, list):
-            query_parts.append(f"{key}: {', '.join(value)}")
-        else:
-            query_parts.append(f"{key}: {value}")
-    
-    combined_query = f"Find clothing with: {'; '.join(query_parts)}"
+    combined_query = f"Find clothing with: {describe_attributes(pending_attributes)}"
     
     with st.spinner("🤖 Getting your final recommendations..."):
         try:
-            result = st.session_state.recommendation_system.get_recommendations(
-                user_query=combined_query,
-                user_preferences=user_prefs
+            result = cached_recommendations(
+                combined_query,
+                tuple(sorted(user_prefs.items()))
             )
             
-            if result['success']:
+            if result.success:
                 # Reset conversation state
                 st.session_state.conversation_active = False
                 st.session_state.pending_attributes = {}
@@ -267,7 +338,7 @@ def get_final_recommendations(pending_attributes: Dict[str, Any], user_prefs: Di
                 # Display recommendations
                 display_recommendations(result)
             else:
-                st.error(f"Still missing information: {result.get('message', 'Unknown error')}")
+                st.error(f"Still missing information: {result.message or 'Unknown error'}")
                 
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
@@ -277,9 +348,9 @@ def get_recommendations(user_query: str, user_prefs: Dict[str, Any]):
     
     with st.spinner("🤖 Analyzing your request and finding perfect matches..."):
         try:
-            result = st.session_state.recommendation_system.get_recommendations(
-                user_query=user_query,
-                user_preferences=user_prefs
+            result = cached_recommendations(
+                user_query,
+                tuple(sorted(user_prefs.items()))
             )
             
             display_recommendations(result)
@@ -287,55 +358,60 @@ def get_recommendations(user_query: str, user_prefs: Dict[str, Any]):
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
 
-def display_recommendations(result: Dict[str, Any]):
+# (label, product key, shown even when empty[, value prefix]) for each column of a product card
+PRODUCT_FIELDS_LEFT = (
+    ("Category", 'category', True),
+    ("Price", 'price', True, "$"),
+    ("Fit", 'fit', False),
+    ("Fabric", 'fabric', False),
+)
+PRODUCT_FIELDS_RIGHT = (
+    ("Color/Print", 'color_or_print', False),
+    ("Available Sizes", 'available_sizes', True),
+    ("Sleeve Length", 'sleeve_length', False),
+    ("Neckline", 'neckline', False),
+    ("Length", 'length', False),
+    ("Pant Type", 'pant_type', False),
+    ("Occasion", 'occasion', False),
+)
+
+def product_fields_markdown(product: Dict[str, Any], fields) -> str:
+    """Render the given product fields as one markdown block, skipping empty optional ones."""
+    return "\n\n".join(
+        f"**{label}:** {prefix[0] if prefix else ''}{product[key]}"
+        for label, key, always, *prefix in fields
+        if always or product.get(key)
+    )
+
+def display_recommendations(result):
     """Display the recommendation results."""
     
-    if result['success']:
+    if result.success:
         # Main recommendation
         st.markdown('<div class="recommendation-box">', unsafe_allow_html=True)
         st.markdown("### 🎉 Your Perfect Match!")
-        st.markdown(result['recommendation'])
+        st.markdown(result.recommendation)
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Product details
-        if result['products']:
+        if result.products:
             st.header("👕 Product Details")
             
-            for i, product in enumerate(result['products']):
+            for i, product in enumerate(result.products):
                 with st.expander(f"🛍️ {product['name']} - ${product['price']}", expanded=(i==0)):
                     col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.write(f"**Category:** {product['category']}")
-                        st.write(f"**Price:** ${product['price']}")
-                        if product.get('fit'):
-                            st.write(f"**Fit:** {product['fit']}")
-                        if product.get('fabric'):
-                            st.write(f"**Fabric:** {product['fabric']}")
-                    
-                    with col2:
-                        if product.get('color_or_print'):
-                            st.write(f"**Color/Print:** {product['color_or_print']}")
-                        st.write(f"**Available Sizes:** {product['available_sizes']}")
-                        if product.get('sleeve_length'):
-                            st.write(f"**Sleeve Length:** {product['sleeve_length']}")
-                        if product.get('neckline'):
-                            st.write(f"**Neckline:** {product['neckline']}")
-                        if product.get('length'):
-                            st.write(f"**Length:** {product['length']}")
-                        if product.get('pant_type'):
-                            st.write(f"**Pant Type:** {product['pant_type']}")
-                        if product.get('occasion'):
-                            st.write(f"**Occasion:** {product['occasion']}")
+                    # One markdown call per column rather than one st.write per field
+                    col1.markdown(product_fields_markdown(product, PRODUCT_FIELDS_LEFT))
+                    col2.markdown(product_fields_markdown(product, PRODUCT_FIELDS_RIGHT))
                     
                     if product.get('description'):
-                        st.write(f"**Description:** {product['description']}")
+                        st.markdown(f"**Description:** {product['description']}")
     
     else:
-        st.error(result['message'])
-        if 'suggested_questions' in result:
+        st.error(result.message)
+        if result.suggested_questions:
             st.markdown("**Please help me by answering:**")
-            for question in result['suggested_questions']:
+            for question in result.suggested_questions:
                 st.write(f"• {question}")
 
 if __name__ == "__main__":
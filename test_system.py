@@ -6,7 +6,7 @@ is working correctly without requiring all dependencies.
 
 import os
 import sys
-from pathlib import Path
+import functools
 
 def test_file_structure():
     """Test that all required files exist."""
@@ -26,12 +26,22 @@ def test_file_structure():
         'modules/similarity_matcher.py',
         'modules/gpt_inference.py',
         'modules/catalog_filter.py',
-        'modules/nlg_generator.py'
+        'modules/nlg_generator.py',
+        'modules/vibe_mappings.py'
     ]
     
+    # One directory listing per parent directory instead of one stat per file
+    existing_files = set()
+    for directory in {os.path.dirname(file_path) for file_path in required_files}:
+        try:
+            with os.scandir(directory or '.') as entries:
+                existing_files.update(os.path.join(directory, entry.name) for entry in entries)
+        except FileNotFoundError:
+            pass
+    
     missing_files = []
     for file_path in required_files:
-        if not Path(file_path).exists():
+        if file_path not in existing_files:
             missing_files.append(file_path)
         else:
             print(f"  ✅ {file_path}")
@@ -51,19 +61,17 @@ def test_basic_imports():
     
     try:
         # Test data loading
-        import json
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+        from vibe_mappings import load_mapping
         
         # Test vibe mappings
-        with open('data/vibes/fit_mapping.json', 'r') as f:
-            fit_data = json.load(f)
+        fit_data = load_mapping('fit')
         print(f"  ✅ Fit mappings loaded: {len(fit_data)} entries")
         
-        with open('data/vibes/color_mapping.json', 'r') as f:
-            color_data = json.load(f)
+        color_data = load_mapping('color')
         print(f"  ✅ Color mappings loaded: {len(color_data)} entries")
         
-        with open('data/vibes/occasion_mapping.json', 'r') as f:
-            occasion_data = json.load(f)
+        occasion_data = load_mapping('occasion')
         print(f"  ✅ Occasion mappings loaded: {len(occasion_data)} entries")
         
         return True
@@ -79,7 +87,12 @@ def test_catalog_loading():
     try:
         import pandas as pd
         
-        catalog_df = pd.read_excel('data/Apparels_shared.xlsx')
+        try:
+            # Calamine is a much faster xlsx parser than the default openpyxl engine
+            catalog_df = pd.read_excel('data/Apparels_shared.xlsx', engine='calamine')
+        except (ImportError, ValueError):
+            # python-calamine isn't installed, or pandas < 2.2 doesn't know the engine
+            catalog_df = pd.read_excel('data/Apparels_shared.xlsx')
         print(f"  ✅ Catalog loaded: {len(catalog_df)} products")
         
         # Check required columns
@@ -97,6 +110,13 @@ def test_catalog_loading():
         print(f"❌ Catalog test failed: {e}")
         return False
 
+@functools.lru_cache(maxsize=None)
+def _shared_catalog_filter():
+    """One CatalogFilter for the tests that need it, so the catalog is parsed once."""
+    sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+    from catalog_filter import CatalogFilter
+    return CatalogFilter()
+
 def test_system_initialization():
     """Test basic system initialization."""
     print("\n🔍 Testing system initialization...")
@@ -106,11 +126,8 @@ def test_system_initialization():
         sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
         sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
         
-        # Test basic module imports (without dependencies that might fail)
-        from catalog_filter import CatalogFilter
-        
-        # Test catalog filter
-        catalog_filter = CatalogFilter()
+        # Test catalog filter (without dependencies that might fail)
+        catalog_filter = _shared_catalog_filter()
         print("  ✅ Catalog filter initialized")
         
         # Test basic filtering
@@ -124,6 +141,121 @@ def test_system_initialization():
         print(f"    This might be due to missing dependencies - install with: pip install -r requirements.txt")
         return False
 
+def test_catalog_filtering():
+    """Test that catalog filtering honours category, size and budget."""
+    print("\n🔍 Testing catalog filtering...")
+    
+    try:
+        catalog_filter = _shared_catalog_filter()
+        products = catalog_filter.filter_products({'category': 'dress', 'size': 'M', 'budget': 100})
+        print(f"  ✅ Filter returned {len(products)} products")
+        
+        for product in products:
+            if product['category'].lower() != 'dress' or product['price'] > 100:
+                print(f"  ❌ Unexpected product in results: {product['name']}")
+                return False
+        
+        prices = [product['price'] for product in products]
+        if prices != sorted(prices):
+            print("  ❌ Results are not sorted by price")
+            return False
+        
+        if catalog_filter.count_matches({'category': 'dress', 'size': 'M', 'budget': 100}) < len(products):
+            print("  ❌ count_matches is lower than the number of filtered products")
+            return False
+        
+        # Sizes match whole tokens: 'S' must not match 'XS', and a size list is not a size
+        for size in ['S', 'XS']:
+            for product in catalog_filter.filter_products({'category': 'dress', 'size': size}):
+                if size not in product['available_sizes'].split(','):
+                    print(f"  ❌ {product['name']} does not offer size {size}")
+                    return False
+        if catalog_filter.count_matches({'size': 'S'}) <= catalog_filter.count_matches({'size': 'XS'}):
+            print("  ❌ Size S should match products that don't offer XS")
+            return False
+        if catalog_filter.count_matches({'size': 'M,L'}) != 0:
+            print("  ❌ A comma-separated size list should not match")
+            return False
+        
+        print("  ✅ Results match category, size, budget and price ordering")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Catalog filtering test failed: {e}")
+        return False
+
+def test_budget_extraction():
+    """Test that budget phrasings are tried in priority order, with $ amounts first."""
+    print("\n🔍 Testing budget extraction...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+        from nlp_analyzer import extract_budget
+        
+        cases = {
+            'a dress under $100': 100.0,
+            'something for 50 dollars': 50.0,
+            'under 100 or $80': 80.0,
+            'around 2 dollars, max $60': 60.0,
+            'max 30, under 20': 20.0,
+            'a casual top': None,
+        }
+        for query, expected in cases.items():
+            budget = extract_budget(query)
+            if budget != expected:
+                print(f"  ❌ '{query}': expected {expected}, got {budget}")
+                return False
+        
+        print(f"  ✅ {len(cases)} budget phrasings extracted correctly")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Budget extraction test failed: {e}")
+        return False
+
+def test_gpt_stream_parsing():
+    """Test that streamed GPT output is cut at the end of the first JSON object."""
+    print("\n🔍 Testing GPT stream parsing...")
+    
+    try:
+        import json
+        from types import SimpleNamespace
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+        from gpt_inference import GPTInference
+        
+        def stream(*pieces):
+            # Fake streamed chat completion chunks, plus one without choices
+            yield SimpleNamespace(choices=[])
+            for piece in pieces:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        
+        escaped = '{"note": "say \\"hi}\\" {", "fit": "Relaxed"}'
+        cases = [
+            ("code fences", stream('```json\n{"category": ', '"dress"}\n```', ' trailing'), {'category': 'dress'}),
+            ("braces inside strings", stream('{"note": "a } and { here", "fit": "Slim"} extra'),
+             {'note': 'a } and { here', 'fit': 'Slim'}),
+            ("escaped quotes", stream(escaped), json.loads(escaped)),
+            ("object split across chunks", stream(*'{"a": {"b": [1, 2]}, "c": "}"}'), {'a': {'b': [1, 2]}, 'c': '}'}),
+        ]
+        
+        gpt = GPTInference(api_key='')
+        for name, chunks, expected in cases:
+            if json.loads(gpt._read_json_stream(chunks)) != expected:
+                print(f"  ❌ Wrong object parsed for {name}")
+                return False
+        
+        # A stream that ends before the braces balance is returned whole for the caller to reject
+        if gpt._read_json_stream(stream('{"a": {"b": ', '1}')) != '{"a": {"b": 1}':
+            print("  ❌ Unbalanced stream was not returned whole")
+            return False
+        
+        print(f"  ✅ {len(cases) + 1} streamed responses parsed correctly")
+        return True
+    
+    except Exception as e:
+        print(f"❌ GPT stream parsing test failed: {e}")
+        return False
+
 def main():
     """Run all tests."""
     print("🌟 Vibe-to-Attribute Clothing Recommendation System - Test Suite")
@@ -133,7 +265,10 @@ def main():
         test_file_structure,
         test_basic_imports,
         test_catalog_loading,
-        test_system_initialization
+        test_system_initialization,
+        test_catalog_filtering,
+        test_budget_extraction,
+        test_gpt_stream_parsing
     ]
     
     passed = 0